@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 from pathlib import Path
+from typing import List, Literal, Optional
 import os
 
 # Resolve absolute path to the ml/models directory relative to this file
@@ -12,8 +13,71 @@ class Settings(BaseSettings):
     database_url: str = "sqlite+aiosqlite:///./returnguard.db"
     salt_secret: str = "returnguard-secret-salt-2024"
     model_path: str = str(_ML_MODELS_DIR / "fraud_model.pkl")
+    # Flattened forest: a .flat directory is memory-mapped (shared across
+    # workers); a .npz file is also accepted
+    flat_model_path: str = str(_ML_MODELS_DIR / "fraud_model.flat")
     feature_names_path: str = str(_ML_MODELS_DIR / "feature_names.json")
     app_env: str = "development"
+    # Train a model at startup when none is on disk (serve.py trains once
+    # before starting workers and turns this off for them)
+    auto_train_on_startup: bool = True
+    # Poll the model files and hot-reload on change (0 disables)
+    model_watch_interval_seconds: float = 0.0
+    # Shared secret for /v1/admin/* (sent as X-Admin-Token); empty disables them
+    admin_token: str = ""
+
+    # SQL statement logging; defaults to on only in development
+    db_echo: Optional[bool] = None
+    # Connection pool (file-backed SQLite and server databases)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout_seconds: float = 30.0
+
+    # SQLite pragmas applied to every new connection. WAL lets scoring reads
+    # proceed while log-action writes commit; NORMAL sync is durable in WAL
+    # except for the last transactions on power loss.
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size_bytes: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
+    sqlite_busy_timeout_ms: int = 5000
+
+    # Micro-batched inference: concurrent scoring requests arriving within
+    # the window are coalesced into one predict_proba call (0 disables)
+    inference_batch_window_ms: float = 2.0
+    inference_batch_max_rows: int = 64
+    # Model calls run on this many threads, off the event loop (0 = inline).
+    # Scoring requests waiting beyond max_pending are rejected with 429.
+    inference_workers: int = 2
+    inference_max_pending: int = 512
+
+    # In-process score cache (per worker); invalidated on /v1/log-action,
+    # TTL bounds staleness across workers. Size or TTL of 0 disables it.
+    score_cache_size: int = 10000
+    score_cache_ttl_seconds: float = 30.0
+
+    # Risk-score audit rows: "background" commits them off the request path
+    # in batches, "inline" writes them in the request's transaction. On a
+    # full queue, "block" waits for space and "drop" discards the row.
+    score_persist_mode: Literal["background", "inline"] = "background"
+    score_persist_overflow: Literal["block", "drop"] = "block"
+    score_persist_batch_size: int = 500
+    score_persist_flush_ms: float = 50.0
+    score_persist_queue_size: int = 10000
+
+    # Write-behind for /v1/log-action: matching events are acknowledged at once
+    # and inserted in bulk when batch_size is reached or flush_ms elapses.
+    # A full queue falls back to a synchronous write.
+    write_behind_enabled: bool = False
+    write_behind_actions: List[str] = ["View", "AddToCart"]
+    write_behind_batch_size: int = 500
+    write_behind_flush_ms: float = 200.0
+    write_behind_queue_size: int = 10000
+
+    # Request latency histograms are always exposed at GET /metrics; this also
+    # adds a Server-Timing header (per-stage ms) to every response. It reveals
+    # internal timings, so leave it off for public traffic.
+    metrics_server_timing: bool = False
 
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=False)
 
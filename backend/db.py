@@ -1,14 +1,55 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from typing import Any, Dict, Iterator, List, Tuple
 from config import get_settings
+from utils.metrics import span
+import logging
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.app_env == "development",
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {},
-)
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    db_url = make_url(url)
+    echo = settings.db_echo if settings.db_echo is not None else settings.app_env == "development"
+    options: Dict[str, Any] = {"echo": echo}
+    is_sqlite = db_url.get_backend_name() == "sqlite"
+    in_memory = is_sqlite and db_url.database in (None, "", ":memory:")
+    if is_sqlite:
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": settings.sqlite_busy_timeout_ms / 1000.0,
+        }
+    # In-memory SQLite uses a single shared connection; no pool to size
+    if not in_memory:
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout_seconds,
+            pool_pre_ping=not is_sqlite,
+        )
+    return options
+
+
+engine = create_async_engine(settings.database_url, **_engine_options(settings.database_url))
+
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_sqlite_pragmas(dbapi_conn, _record):
+        """Tune each new SQLite connection (WAL, sync level, caches, lock wait)."""
+        cursor = dbapi_conn.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size_bytes)}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size={-int(settings.sqlite_cache_size_kib)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -23,11 +64,31 @@ class Base(DeclarativeBase):
     pass
 
 
+# Bound on bind parameters per IN (...) clause (SQLite's historical limit is 999)
+IN_CLAUSE_CHUNK = 900
+
+
+def chunked(items: List, size: int = IN_CLAUSE_CHUNK) -> Iterator[List]:
+    """Split a list of keys into IN-clause sized chunks."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def dialect_insert(table):
+    """insert() with ON CONFLICT support (on_conflict_do_nothing / _do_update)."""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
 async def get_db():
     async with AsyncSessionLocal() as session:
         try:
             yield session
-            await session.commit()
+            with span("db_commit"):
+                await session.commit()
         except Exception:
             await session.rollback()
             raise
@@ -35,8 +96,53 @@ async def get_db():
             await session.close()
 
 
+def _upgrade_indexes(sync_conn) -> Tuple[List[str], List[str]]:
+    """
+    create_all() skips tables that already exist, indexes included; add any
+    index declared on the models that an older database is missing, and
+    drop the non-unique indexes a declared one now covers through its
+    prefix (the single-column user_hash indexes the composites replaced).
+    Returns the names created and dropped.
+    """
+    from sqlalchemy import inspect, text
+    inspector = inspect(sync_conn)
+    created, dropped = [], []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = inspector.get_indexes(table.name)
+        names = {ix["name"] for ix in existing}
+        # Databases built from schema.sql name their indexes differently
+        column_sets = {tuple(ix["column_names"]) for ix in existing}
+        declared = [tuple(c.name for c in index.columns) for index in table.indexes]
+        for index, columns in zip(table.indexes, declared):
+            if index.name not in names and columns not in column_sets:
+                index.create(sync_conn)
+                created.append(index.name)
+        for ix in existing:
+            columns = tuple(ix["column_names"])
+            if ix["unique"] or columns in declared:
+                continue
+            if any(len(d) > len(columns) and d[:len(columns)] == columns for d in declared):
+                sync_conn.execute(text(f'DROP INDEX IF EXISTS "{ix["name"]}"'))
+                dropped.append(ix["name"])
+    return created, dropped
+
+
 async def init_db():
-    """Create all tables on startup."""
-    from models.orm_models import User, Transaction, RiskScore  # noqa: F401
+    """
+    Create all tables on startup. On SQLite, also bring an existing
+    database's indexes up to date; PostgreSQL gets them from
+    database/migrations/ (CREATE INDEX CONCURRENTLY, outside a transaction),
+    since building one here would lock the table for writes.
+    """
+    from models.orm_models import User, Transaction, RiskScore, UserFeatureState  # noqa: F401
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        if engine.dialect.name != "sqlite":
+            return
+        created, dropped = await conn.run_sync(_upgrade_indexes)
+    for name in created:
+        logger.info(f"✅ Created index {name}")
+    for name in dropped:
+        logger.info(f"✅ Dropped index {name}, covered by a composite index")
@@ -88,20 +88,63 @@ def total_returns(history: List[Dict[str, Any]]) -> int:
     return sum(1 for t in history if t["action_type"] == "ReturnRequest")
 
 
+def extract_features(history: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Single-pass equivalent of the seven feature functions above.
+    Walks the history once, parsing each ISO date at most once, and
+    returns exactly the dict those functions would produce together.
+    """
+    purchases = returns = 0
+    gap_sum = gap_count = 0
+    value_sum = 0.0
+    value_count = 0
+    categories = set()
+    product_sizes: Dict[str, set] = defaultdict(set)
+
+    for t in history:
+        action = t["action_type"]
+        if action == "Purchase":
+            purchases += 1
+            value = t.get("order_value")
+            if value:
+                value_sum += float(value)
+                value_count += 1
+            category = t.get("product_category")
+            if category:
+                categories.add(category)
+            product_id = t.get("product_id")
+            size = t.get("size_variant")
+            if product_id and size:
+                product_sizes[product_id].add(size)
+        elif action == "ReturnRequest":
+            returns += 1
+            delivery = t.get("delivery_date")
+            returned = t.get("return_date")
+            if delivery and returned:
+                if isinstance(delivery, str):
+                    delivery = datetime.fromisoformat(delivery)
+                if isinstance(returned, str):
+                    returned = datetime.fromisoformat(returned)
+                gap_sum += max(0, (returned - delivery).days)
+                gap_count += 1
+
+    return {
+        "return_to_purchase_ratio": round(returns / purchases, 4) if purchases else 0.0,
+        "temporal_gap_days": round(gap_sum / gap_count, 2) if gap_count else 30.0,
+        "size_variation_flag": float(any(len(s) >= 3 for s in product_sizes.values())),
+        "category_diversity": round(len(categories) / purchases, 4) if purchases else 0.0,
+        "avg_order_value": round(value_sum / value_count, 2) if value_count else 0.0,
+        "total_purchases": float(purchases),
+        "total_returns": float(returns),
+    }
+
+
 def assemble_features(history: List[Dict[str, Any]]) -> Dict[str, float]:
     """
     Assembles the full feature vector for ML model inference.
     Feature names MUST match those used during model training.
     """
-    return {
-        "return_to_purchase_ratio": return_to_purchase_ratio(history),
-        "temporal_gap_days": temporal_gap_score(history),
-        "size_variation_flag": float(size_variation_flag(history)),
-        "category_diversity": category_diversity_score(history),
-        "avg_order_value": avg_order_value(history),
-        "total_purchases": float(total_purchases(history)),
-        "total_returns": float(total_returns(history)),
-    }
+    return extract_features(history)
 
 
 def get_reason_codes(features: Dict[str, float]) -> List[str]:
@@ -118,3 +161,73 @@ def get_reason_codes(features: Dict[str, float]) -> List[str]:
     if features["total_returns"] >= 5:
         reasons.append("excessive_return_count")
     return reasons if reasons else ["no_significant_flags"]
+
+
+# ── Incremental feature state ────────────────────────────────────────────────
+# A compact running aggregate that yields the same features as
+# assemble_features() without replaying the transaction history.
+
+# Actions update_feature_state() folds in; any other action leaves it unchanged
+FOLDED_ACTIONS = frozenset({"Purchase", "ReturnRequest"})
+
+
+def new_feature_state() -> Dict[str, Any]:
+    """Empty aggregate for a user with no recorded actions."""
+    return {
+        "purchase_count": 0,
+        "return_count": 0,
+        "gap_days_sum": 0,
+        "gap_count": 0,
+        "order_value_sum": 0.0,
+        "order_value_count": 0,
+        "categories": set(),
+        "product_sizes": defaultdict(set),
+    }
+
+
+def _as_datetime(value: Any) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    # Timezones are dropped on storage, so compare wall-clock times
+    return value.replace(tzinfo=None) if value.tzinfo is not None else value
+
+
+def update_feature_state(state: Dict[str, Any], txn: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold a single transaction into the aggregate (in place) and return it."""
+    action = txn["action_type"]
+    if action == "Purchase":
+        state["purchase_count"] += 1
+        if txn.get("order_value"):
+            state["order_value_sum"] += float(txn["order_value"])
+            state["order_value_count"] += 1
+        if txn.get("product_category"):
+            state["categories"].add(txn["product_category"])
+        if txn.get("product_id") and txn.get("size_variant"):
+            state["product_sizes"][txn["product_id"]].add(txn["size_variant"])
+    elif action == "ReturnRequest":
+        state["return_count"] += 1
+        if txn.get("delivery_date") and txn.get("return_date"):
+            gap = _as_datetime(txn["return_date"]) - _as_datetime(txn["delivery_date"])
+            state["gap_days_sum"] += max(0, gap.days)
+            state["gap_count"] += 1
+    return state
+
+
+def features_from_state(state: Dict[str, Any]) -> Dict[str, float]:
+    """Feature vector for a folded aggregate; identical to assemble_features()."""
+    purchases = state["purchase_count"]
+    returns = state["return_count"]
+    return {
+        "return_to_purchase_ratio": round(returns / purchases, 4) if purchases else 0.0,
+        "temporal_gap_days": (
+            round(state["gap_days_sum"] / state["gap_count"], 2) if state["gap_count"] else 30.0
+        ),
+        "size_variation_flag": float(any(len(s) >= 3 for s in state["product_sizes"].values())),
+        "category_diversity": round(len(state["categories"]) / purchases, 4) if purchases else 0.0,
+        "avg_order_value": (
+            round(state["order_value_sum"] / state["order_value_count"], 2)
+            if state["order_value_count"] else 0.0
+        ),
+        "total_purchases": float(purchases),
+        "total_returns": float(returns),
+    }
@@ -0,0 +1,128 @@
+"""
+import_profile.py — cold-start import budget for the serving path
+
+Imports `main` (and, with --with-model, loads the model the way startup
+does) in a fresh interpreter under `python -X importtime`, then reports:
+  - wall time to import the app (best of --repeat fresh runs)
+  - the slowest direct imports of main by cumulative time, and the slowest
+    individual modules by self time
+  - any training-only module (pandas, scikit-learn, joblib, ...) that
+    leaked into the serving import graph
+
+Exits non-zero when the wall time exceeds --budget-ms or a training-only
+module is imported, so it can gate CI or a deploy.
+
+Usage:
+    python import_profile.py
+    python import_profile.py --with-model --budget-ms 2500 --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+# Needed to train, never to serve — the flat forest scores with NumPy alone
+TRAINING_ONLY_MODULES = ["pandas", "sklearn", "joblib", "scipy", "xgboost", "imblearn", "matplotlib", "pyarrow"]
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import main
+elapsed = time.perf_counter() - t0
+if {with_model}:
+    t1 = time.perf_counter()
+    main.model_service.load_model(main.settings.model_path, main.settings.feature_names_path, main.settings.flat_model_path)
+    load = time.perf_counter() - t1
+else:
+    load = 0.0
+leaked = [m for m in {modules!r} if m in sys.modules]
+print(json.dumps({{"import_s": elapsed, "load_s": load, "leaked": leaked,
+                  "model_type": main.model_service.current().model_type}}))
+"""
+
+
+def _run(with_model: bool, importtime: bool) -> Tuple[Dict, str]:
+    code = _PROBE.format(with_model=with_model, modules=TRAINING_ONLY_MODULES)
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    env = {**os.environ, "APP_ENV": os.environ.get("APP_ENV", "production")}
+    proc = subprocess.run(cmd, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.exit(f"❌ Probe failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) for every `-X importtime` line."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        # One separator space, then two spaces per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cum_us), depth))
+    return rows
+
+
+def _direct_imports(rows: List[Tuple[str, int, int, int]], module: str) -> List[Tuple[str, int, int, int]]:
+    """
+    Rows `module` imported itself. -X importtime lists a module after its
+    imports, so they are the depth-1 rows between the previous depth-0 row
+    and `module`'s own.
+    """
+    children: List[Tuple[str, int, int, int]] = []
+    for row in rows:
+        if row[3] == 0:
+            if row[0] == module:
+                return children
+            children = []
+        elif row[3] == 1:
+            children.append(row)
+    return []
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure the backend's cold-start import cost")
+    parser.add_argument("--budget-ms", type=float, default=2500.0, help="Max wall time to import (and load)")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters to time; best run counts")
+    parser.add_argument("--top", type=int, default=15, help="Rows per table")
+    parser.add_argument("--with-model", action="store_true", help="Also time load_model() as at startup")
+    args = parser.parse_args()
+
+    runs = [_run(args.with_model, importtime=False)[0] for _ in range(max(1, args.repeat))]
+    best = min(runs, key=lambda r: r["import_s"] + r["load_s"])
+    result, stderr = _run(args.with_model, importtime=True)
+    rows = _parse_importtime(stderr)
+
+    print("\n📦 Slowest imports of main (cumulative ms)")
+    for name, _, cum, _ in sorted(_direct_imports(rows, "main"), key=lambda r: -r[2])[:args.top]:
+        print(f"   {cum / 1000:8.1f}  {name}")
+    print("\n🐢 Slowest modules (self ms)")
+    for name, self_us, _, _ in sorted(rows, key=lambda r: -r[1])[:args.top]:
+        print(f"   {self_us / 1000:8.1f}  {name}")
+
+    total_ms = (best["import_s"] + best["load_s"]) * 1000
+    print(f"\n⏱️  import main: {best['import_s'] * 1000:.0f} ms"
+          + (f" + load_model: {best['load_s'] * 1000:.0f} ms ({best['model_type']})" if args.with_model else "")
+          + f" — budget {args.budget_ms:.0f} ms (best of {len(runs)})")
+
+    ok = True
+    leaked = sorted(set(best["leaked"]) | set(result["leaked"]))
+    if leaked:
+        print(f"❌ Training-only modules on the serving path: {', '.join(leaked)}")
+        ok = False
+    if total_ms > args.budget_ms:
+        print(f"❌ Over budget by {total_ms - args.budget_ms:.0f} ms")
+        ok = False
+    if ok:
+        print("✅ Within budget; serving path imports NumPy only")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,14 +2,18 @@
 ReturnGuard AI — FastAPI Application Entry Point
 """
 import logging
+import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from config import get_settings
 from db import init_db
-from services import model_service
-from routes import transactions, risk
+from services import model_service, model_watcher, background_training, action_log, score_store, inference
+from services.score_cache import cache as score_cache
+from routes import transactions, risk, admin
+from utils import metrics
 
 logging.basicConfig(
     level=logging.INFO,
@@ -27,22 +31,30 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("✅ Database initialized")
     
-    # Auto-train if models are missing
-    import os
-    if not os.path.exists(settings.model_path) or not os.path.exists(settings.feature_names_path):
-        logger.info("🔧 ML model not found on disk. Generating model locally...")
-        try:
-            from startup_train import train_model
-            train_model()
-            logger.info("✅ Auto-training complete!")
-        except Exception as e:
-            logger.error(f"❌ Auto-training failed: {e}")
-            logger.warning("⚠️  Falling back to rule-based scoring.")
-
-    # Load ML model
-    model_service.load_model(settings.model_path, settings.feature_names_path)
+    # Load ML model (rule-based fallback if none is on disk yet)
+    model_service.load_model(settings.model_path, settings.feature_names_path, settings.flat_model_path)
+
+    # Auto-train if models are missing — in a background process, so the API
+    # accepts traffic right away and swaps the model in when it is ready.
+    # Artifacts that exist but fail to load are never trained over: the app
+    # stays not-ready until they are fixed or removed
+    model_missing = not os.path.exists(settings.model_path) or not os.path.exists(settings.feature_names_path)
+    if model_missing and not model_service.is_loaded() and settings.auto_train_on_startup:
+        background_training.start()
+    elif model_service.load_error():
+        logger.error(f"❌ Model artifacts at {settings.model_path} failed to load; not retraining over them. "
+                     "Serving rule-based scores until they are fixed or removed.")
+
+    model_watcher.start()
+    action_log.start_writer()
+    score_store.start_writer()
     yield
     logger.info("🛑 ReturnGuard AI shutting down...")
+    await background_training.stop()
+    await model_watcher.stop()
+    await action_log.stop_writer()
+    await score_store.stop_writer()
+    inference.shutdown()
 
 
 app = FastAPI(
@@ -66,9 +78,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency histograms (and optional Server-Timing), outermost so the
+# timing covers every other middleware
+app.add_middleware(metrics.MetricsMiddleware, server_timing=settings.metrics_server_timing)
+
+metrics.register_gauge("inference_pending", "Scoring requests waiting for the model pool.", inference.pending)
+metrics.register_gauge("score_cache_entries", "Scores held in the in-process cache.", lambda: len(score_cache))
+metrics.register_gauge("score_queue_depth", "Risk scores waiting for the background writer.", score_store.queue_depth)
+metrics.register_gauge("action_queue_depth", "Actions waiting for the write-behind writer.", action_log.queue_depth)
+
+
+@app.exception_handler(inference.InferenceOverloaded)
+async def inference_overloaded(request: Request, exc: inference.InferenceOverloaded):
+    # Backpressure: the model pool is saturated, ask the caller to retry shortly
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
 # Register routers
 app.include_router(transactions.router)
 app.include_router(risk.router)
+app.include_router(admin.router)
 
 
 @app.api_route("/", methods=["GET", "HEAD"], tags=["Health"])
@@ -78,10 +107,31 @@ async def root():
         "version": "1.0.0",
         "status": "operational",
         "docs": "/docs",
-        "model_loaded": model_service._model is not None,
+        "model_loaded": model_service.is_loaded(),
+        "model_version": model_service.model_version(),
     }
 
 
 @app.api_route("/health", methods=["GET", "HEAD"], tags=["Health"])
-async def health():
-    return {"status": "ok"}
+async def health(require_model: bool = False):
+    """
+    Liveness/readiness. The API serves (rule-based) scores while a model is
+    still training or failed to load; pass ?require_model=true to get 503
+    until it is loaded. model_error says why artifacts on disk were rejected.
+    """
+    body = {
+        "status": "ok",
+        "model_ready": model_service.is_loaded(),
+        "model_version": model_service.model_version(),
+        "model_error": model_service.load_error(),
+        "training": background_training.status(),
+    }
+    if require_model and not body["model_ready"]:
+        return JSONResponse(status_code=503, content={**body, "status": "model_not_ready"})
+    return body
+
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Latency histograms, quantiles and queue gauges in Prometheus text format."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Numeric, Integer, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, Numeric, Integer, Float, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from db import Base
@@ -14,13 +14,14 @@ class User(Base):
 
     transactions = relationship("Transaction", back_populates="user", cascade="all, delete")
     risk_scores = relationship("RiskScore", back_populates="user", cascade="all, delete")
+    feature_state = relationship("UserFeatureState", back_populates="user", uselist=False, cascade="all, delete")
 
 
 class Transaction(Base):
     __tablename__ = "transactions"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_hash = Column(String(64), ForeignKey("users.user_hash", ondelete="CASCADE"), nullable=False, index=True)
+    user_hash = Column(String(64), ForeignKey("users.user_hash", ondelete="CASCADE"), nullable=False)
     action_type = Column(String(20), nullable=False)   # View | AddToCart | Purchase | ReturnRequest
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
     order_value = Column(Numeric(10, 2), nullable=True)
@@ -33,12 +34,18 @@ class Transaction(Base):
 
     user = relationship("User", back_populates="transactions")
 
+    # Serves "WHERE user_hash = ? ORDER BY timestamp DESC LIMIT n" straight
+    # from the index (and any user_hash-only lookup via its prefix)
+    __table_args__ = (
+        Index("idx_transactions_user_hash_timestamp", user_hash, timestamp.desc()),
+    )
+
 
 class RiskScore(Base):
     __tablename__ = "risk_scores"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_hash = Column(String(64), ForeignKey("users.user_hash", ondelete="CASCADE"), nullable=False, index=True)
+    user_hash = Column(String(64), ForeignKey("users.user_hash", ondelete="CASCADE"), nullable=False)
     risk_score = Column(Numeric(5, 2), nullable=False)
     risk_level = Column(String(10), nullable=False)   # LOW | MEDIUM | HIGH
     reason_codes = Column(Text, nullable=True)         # JSON array stored as text
@@ -46,3 +53,25 @@ class RiskScore(Base):
     model_version = Column(String(20), default="v1.0")
 
     user = relationship("User", back_populates="risk_scores")
+
+    __table_args__ = (
+        Index("idx_risk_scores_user_hash_computed_at", user_hash, computed_at.desc()),
+    )
+
+
+class UserFeatureState(Base):
+    """Running behavioral aggregates, folded forward on every logged action."""
+    __tablename__ = "user_feature_state"
+
+    user_hash = Column(String(64), ForeignKey("users.user_hash", ondelete="CASCADE"), primary_key=True)
+    purchase_count = Column(Integer, nullable=False, default=0)
+    return_count = Column(Integer, nullable=False, default=0)
+    gap_days_sum = Column(Integer, nullable=False, default=0)
+    gap_count = Column(Integer, nullable=False, default=0)
+    order_value_sum = Column(Float, nullable=False, default=0.0)
+    order_value_count = Column(Integer, nullable=False, default=0)
+    categories = Column(Text, nullable=True)           # JSON array of purchased categories
+    product_sizes = Column(Text, nullable=True)        # JSON object: product_id -> [sizes]
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    user = relationship("User", back_populates="feature_state")
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+from sqlalchemy import select
+from typing import List, Optional
+import hmac
+
+from config import get_settings
+from db import AsyncSessionLocal, IN_CLAUSE_CHUNK
+from models.orm_models import User
+from services import feature_state, model_service
+from services.score_cache import cache as score_cache
+
+router = APIRouter(prefix="/v1/admin", tags=["Admin"])
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints are disabled unless ADMIN_TOKEN is set; callers send it as X-Admin-Token."""
+    token = get_settings().admin_token
+    if not token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (set ADMIN_TOKEN)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@router.post("/reload-model", dependencies=[Depends(require_admin)],
+             summary="Load the model on disk and swap it in without a restart")
+async def reload_model():
+    """
+    Loads the current model artifacts in the background, validates them on a
+    canary batch and atomically replaces the active model. In-flight requests
+    finish on the previous model; on failure the previous model stays active.
+    With several workers this reloads only the worker that serves the call —
+    use MODEL_WATCH_INTERVAL_SECONDS to have every worker pick up new files.
+    """
+    settings = get_settings()
+    previous = model_service.model_version()
+    try:
+        active = await model_service.reload_model(
+            settings.model_path, settings.feature_names_path, settings.flat_model_path
+        )
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Model reload rejected: {e}")
+    return {
+        "status": "reloaded" if active.version != previous else "unchanged",
+        "previous_version": previous,
+        "model_version": active.version,
+        "model_type": active.model_type,
+    }
+
+
+class RebuildFeatureStateRequest(BaseModel):
+    user_hashes: Optional[List[str]] = None     # omitted: every registered user
+
+
+@router.post("/rebuild-feature-state", dependencies=[Depends(require_admin)],
+             summary="Rebuild per-user feature aggregates from transaction history")
+async def rebuild_feature_state(payload: RebuildFeatureStateRequest = RebuildFeatureStateRequest()):
+    """
+    Recomputes users' persisted feature aggregates from their full history
+    and rewrites the rows that disagree with it (e.g. counts lost to
+    concurrent writes before per-user locking). Runs in chunks, each in its
+    own transaction, so log-action writers are held up for one chunk at most.
+    """
+    checked, repaired = 0, []
+    after = None
+    while True:
+        async with AsyncSessionLocal() as db:
+            if payload.user_hashes is not None:
+                chunk = payload.user_hashes[checked:checked + IN_CLAUSE_CHUNK]
+            else:
+                query = select(User.user_hash).order_by(User.user_hash).limit(IN_CLAUSE_CHUNK)
+                if after is not None:
+                    query = query.where(User.user_hash > after)
+                chunk = list((await db.execute(query)).scalars())
+            if not chunk:
+                break
+            fixed = await feature_state.repair_states(db, chunk)
+            await db.commit()
+        for user_hash in fixed:
+            score_cache.invalidate(user_hash)
+        repaired.extend(fixed)
+        checked += len(chunk)
+        after = chunk[-1]
+    return {"checked": checked, "repaired": len(repaired), "user_hashes": repaired[:100]}
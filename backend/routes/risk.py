@@ -1,14 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import json
 
 from db import get_db
-from models.orm_models import User, Transaction, RiskScore
-from features.engineer import assemble_features, get_reason_codes
-from services import model_service
+from models.orm_models import RiskScore
+from features.engineer import features_from_state, get_reason_codes, new_feature_state
+from services import model_service, feature_state, inference, score_store
+from services.score_cache import cache as score_cache
+from utils.metrics import span
 
 router = APIRouter(prefix="/v1", tags=["Risk Scoring"])
 
@@ -32,6 +34,20 @@ class RiskScoreResponse(BaseModel):
     reason_codes: List[str]
     features_used: dict
     model_used: str
+    model_version: str           # artifact that produced the score
+
+
+class BulkRiskScoreRequest(BaseModel):
+    user_hashes: List[str] = Field(..., min_length=1, max_length=10000)
+
+
+class BulkRiskScoreResponse(BaseModel):
+    count: int
+    scores: List[RiskScoreResponse]
+
+
+def _model_label(version: str) -> str:
+    return "heuristic_fallback" if version == model_service.HEURISTIC_VERSION else "XGBoost"
 
 
 def _classify_level(score: int) -> str:
@@ -47,77 +63,119 @@ def _classify_level(score: int) -> str:
 async def get_risk_score(payload: RiskScoreRequest, db: AsyncSession = Depends(get_db)):
     """
     Core inference endpoint.
-    1. Fetches user's transaction history from DB
+    1. Reads the user and their persisted behavioral aggregate in one query
     2. Engineers behavioral features
     3. Runs XGBoost model (or heuristic fallback)
     4. Returns 0–100 risk score + explainable reason codes
+
+    Scores are served from the in-process cache until the user logs a new
+    action, the TTL expires, or the model version changes.
     """
-    # Fetch transaction history
-    result = await db.execute(
-        select(Transaction)
-        .where(Transaction.user_hash == payload.user_hash)
-        .order_by(Transaction.timestamp.desc())
-        .limit(200)
-    )
-    transactions = result.scalars().all()
-
-    history = [
-        {
-            "action_type": t.action_type,
-            "product_id": t.product_id,
-            "product_category": t.product_category,
-            "order_value": float(t.order_value) if t.order_value else None,
-            "size_variant": t.size_variant,
-            "delivery_date": t.delivery_date,
-            "return_date": t.return_date,
-        }
-        for t in transactions
-    ]
+    with span("cache"):
+        cached = score_cache.get(payload.user_hash, model_service.model_version())
+    if cached is not None:
+        return cached
+    # Taken before the state read: a log-action committing in between makes put() a no-op
+    generation = score_cache.generation()
+
+    # User lookup + running behavioral aggregate in one query (None = unregistered)
+    with span("db_fetch"):
+        state = await feature_state.load_state(db, payload.user_hash)
 
     # Engineer features
-    features = assemble_features(history)
-    reason_codes = get_reason_codes(features)
+    with span("features"):
+        features = features_from_state(state or new_feature_state())
+        reason_codes = get_reason_codes(features)
 
-    # Model inference
-    proba = model_service.predict(features)
+    # Model inference (coalesced with concurrent requests into one batch)
+    with span("inference"):
+        proba, version = await inference.predict(features)
     score = model_service.score_to_100(proba)
     level = _classify_level(score)
 
-    # Persist score
-    user_result = await db.execute(select(User).where(User.user_hash == payload.user_hash))
-    user = user_result.scalar_one_or_none()
-    if user:
-        user.risk_tier = level
-        risk_entry = RiskScore(
-            user_hash=payload.user_hash,
-            risk_score=score,
-            risk_level=level,
-            reason_codes=json.dumps(reason_codes),
-            model_version="v1.0",
-        )
-        db.add(risk_entry)
-
-    model_used = "XGBoost" if model_service._model is not None else "heuristic_fallback"
-
-    return RiskScoreResponse(
+    # Persist score + risk tier for registered users (queued off the request path
+    # in background mode; one write statement inline on Postgres)
+    if state is not None:
+        with span("persist"):
+            await score_store.record_scores(db, [{
+                "user_hash": payload.user_hash,
+                "risk_score": score,
+                "risk_level": level,
+                "reason_codes": reason_codes,
+                "model_version": version,
+            }])
+
+    response = RiskScoreResponse(
         user_hash=payload.user_hash,
         risk_score=score,
         risk_level=level,
         reason_codes=reason_codes,
         features_used=features,
-        model_used=model_used,
+        model_used=_model_label(version),
+        model_version=version,
     )
+    score_cache.put(payload.user_hash, version, response, generation)
+    return response
+
+
+@router.post("/get-risk-scores", response_model=BulkRiskScoreResponse,
+             summary="Score many users in one request (batch re-scoring)")
+async def get_risk_scores(payload: BulkRiskScoreRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Bulk inference endpoint for re-scoring large user sets.
+    Loads every user's aggregate in one pass, runs the model once over the
+    whole feature matrix, and persists all scores with bulk writes.
+    Unknown users are scored on empty history but not persisted.
+    """
+    user_hashes = list(dict.fromkeys(payload.user_hashes))
+    with span("db_fetch"):
+        states = await feature_state.load_states(db, user_hashes)
+
+    with span("features"):
+        all_features = [
+            features_from_state(states.get(h) or new_feature_state()) for h in user_hashes
+        ]
+    with span("inference"):
+        probas, version = await inference.predict_many(all_features)
+    model_used = _model_label(version)
+
+    responses, to_persist = [], []
+    for user_hash, features, proba in zip(user_hashes, all_features, probas):
+        score = model_service.score_to_100(proba)
+        level = _classify_level(score)
+        reason_codes = get_reason_codes(features)
+        responses.append(RiskScoreResponse(
+            user_hash=user_hash,
+            risk_score=score,
+            risk_level=level,
+            reason_codes=reason_codes,
+            features_used=features,
+            model_used=model_used,
+            model_version=version,
+        ))
+        if user_hash in states:
+            to_persist.append({
+                "user_hash": user_hash,
+                "risk_score": score,
+                "risk_level": level,
+                "reason_codes": reason_codes,
+                "model_version": version,
+            })
+
+    with span("persist"):
+        await score_store.record_scores(db, to_persist)
+    return BulkRiskScoreResponse(count=len(responses), scores=responses)
 
 
 @router.get("/score-history/{user_hash}", summary="Get historical risk scores for a user")
 async def score_history(user_hash: str, db: AsyncSession = Depends(get_db)):
     result = await db.execute(
-        select(RiskScore)
+        select(RiskScore.risk_score, RiskScore.risk_level, RiskScore.reason_codes, RiskScore.computed_at)
         .where(RiskScore.user_hash == user_hash)
         .order_by(RiskScore.computed_at.desc())
         .limit(20)
     )
-    scores = result.scalars().all()
+    scores = result.all()
     return {
         "user_hash": user_hash,
         "scores": [
@@ -6,7 +6,9 @@ from typing import Optional
 from datetime import datetime, timezone
 
 from db import get_db
-from models.orm_models import User, Transaction
+from models.orm_models import Transaction
+from services import action_log
+from utils.metrics import span
 
 router = APIRouter(prefix="/v1", tags=["Transactions"])
 
@@ -31,7 +33,9 @@ VALID_ACTION_TYPES = {"View", "AddToCart", "Purchase", "ReturnRequest"}
 async def log_action(payload: LogActionRequest, db: AsyncSession = Depends(get_db)):
     """
     Records a behavioral fingerprint event (View, AddToCart, Purchase, or ReturnRequest).
-    Upserts the user record if it doesn't exist yet.
+    Upserts the user record if it doesn't exist yet and updates the
+    user's persisted feature aggregate. With write-behind enabled, matching
+    events are acknowledged as "queued" and inserted in bulk shortly after.
     """
     if payload.action_type not in VALID_ACTION_TYPES:
         raise HTTPException(
@@ -39,50 +43,56 @@ async def log_action(payload: LogActionRequest, db: AsyncSession = Depends(get_d
             detail=f"action_type must be one of {sorted(VALID_ACTION_TYPES)}"
         )
 
-    # Upsert user
-    result = await db.execute(select(User).where(User.user_hash == payload.user_hash))
-    user = result.scalar_one_or_none()
-    if not user:
-        user = User(
-            user_hash=payload.user_hash,
-            store_id=payload.store_id,
-            first_seen_at=datetime.now(timezone.utc),
-        )
-        db.add(user)
-        await db.flush()
+    event = {
+        "user_hash": payload.user_hash,
+        "action_type": payload.action_type,
+        "timestamp": datetime.now(timezone.utc),
+        "order_value": payload.order_value,
+        "product_category": payload.product_category,
+        "product_id": payload.product_id,
+        "size_variant": payload.size_variant,
+        "delivery_date": payload.delivery_date,
+        "return_date": payload.return_date,
+        "order_id": payload.order_id,
+        "store_id": payload.store_id,
+    }
 
-    # Insert transaction
-    txn = Transaction(
-        user_hash=payload.user_hash,
-        action_type=payload.action_type,
-        timestamp=datetime.now(timezone.utc),
-        order_value=payload.order_value,
-        product_category=payload.product_category,
-        product_id=payload.product_id,
-        size_variant=payload.size_variant,
-        delivery_date=payload.delivery_date,
-        return_date=payload.return_date,
-        order_id=payload.order_id,
-    )
-    db.add(txn)
+    # Write-behind: acknowledge now, insert with the next bulk batch
+    with span("enqueue"):
+        queued = action_log.enqueue(event)
+    if queued:
+        status = "queued"
+    else:
+        with span("db_write"):
+            await action_log.record_actions(db, [event])
+        status = "recorded"
 
     return {
-        "status": "recorded",
+        "status": status,
         "user_hash": payload.user_hash,
         "action_type": payload.action_type,
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": event["timestamp"].isoformat(),
     }
 
 
 @router.get("/history/{user_hash}", summary="Get transaction history for a user")
 async def get_history(user_hash: str, db: AsyncSession = Depends(get_db)):
     result = await db.execute(
-        select(Transaction)
+        select(
+            Transaction.action_type,
+            Transaction.product_id,
+            Transaction.product_category,
+            Transaction.order_value,
+            Transaction.size_variant,
+            Transaction.timestamp,
+            Transaction.delivery_date,
+            Transaction.return_date,
+        )
         .where(Transaction.user_hash == user_hash)
         .order_by(Transaction.timestamp.desc())
         .limit(100)
     )
-    transactions = result.scalars().all()
+    transactions = result.all()
     return {
         "user_hash": user_hash,
         "count": len(transactions),
@@ -0,0 +1,91 @@
+"""
+serve.py — multi-worker production entry point
+
+Prepares the model artifacts once, in this parent process, and then starts
+uvicorn with several worker processes:
+
+  1. exports the memory-mappable flat forest (fraud_model.flat/) if it is
+     missing or older than the pickle
+  2. creates the database schema, so workers don't race on CREATE TABLE
+  3. runs `main:app` with WEB_CONCURRENCY workers
+
+If no model exists yet, one training process (`startup_train.py
+--train-only`) is launched alongside the workers instead of before them:
+workers start serving rule-based scores at once and their model watchers
+load the artifacts when training writes them.
+
+Every worker memory-maps the same fraud_model.flat/ arrays, so the forest
+occupies the page cache once per host instead of once per worker, and
+workers never import scikit-learn or train on their own.
+
+Usage:
+    python serve.py                      # workers = CPU count, port $PORT or 8000
+    WEB_CONCURRENCY=4 PORT=10000 python serve.py
+"""
+import os
+import sys
+import logging
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from startup_train import BACKEND_DIR, MODEL_PKL, MODEL_FLAT, FEAT_JSON
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+log = logging.getLogger("serve")
+
+
+def export_flat_model(model_pkl: Path = MODEL_PKL, out_dir: Path = MODEL_FLAT) -> bool:
+    """(Re)build the flat forest from the pickle when it is missing or stale."""
+    from services.flat_forest import FlatForest
+    if not model_pkl.exists():
+        return False
+    if FlatForest.exists(str(out_dir)) and FlatForest.mtime(str(out_dir)) >= model_pkl.stat().st_mtime:
+        return True
+
+    import joblib
+    model = joblib.load(model_pkl)
+    if not hasattr(model, "estimators_"):
+        log.warning(f"⚠️  {type(model).__name__} is not a tree forest — workers will each load the pickle.")
+        return False
+    FlatForest.from_sklearn(model).save(str(out_dir))
+    log.info(f"✅ Flat forest exported → {out_dir}")
+    return True
+
+
+def prepare_model() -> Optional[subprocess.Popen]:
+    """Refresh the flat export, or start the one training process if no model exists."""
+    if MODEL_PKL.exists() and FEAT_JSON.exists():
+        export_flat_model()
+        return None
+    log.info("🔧 ML model not found — training in the background; workers serve rule-based scores meanwhile.")
+    return subprocess.Popen([sys.executable, str(BACKEND_DIR / "startup_train.py"), "--train-only"], cwd=BACKEND_DIR)
+
+
+async def prepare_db() -> None:
+    from db import engine, init_db
+    await init_db()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    import asyncio
+    trainer = prepare_model()
+    asyncio.run(prepare_db())
+
+    # Workers never train themselves; while a model is being trained they
+    # poll for its files (unless a watch interval is configured explicitly)
+    os.environ["AUTO_TRAIN_ON_STARTUP"] = "false"
+    if trainer is not None:
+        os.environ.setdefault("MODEL_WATCH_INTERVAL_SECONDS", "5")
+    workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+    port = int(os.environ.get("PORT", 8000))
+
+    log.info(f"🚀 Starting uvicorn with {workers} workers on port {port}...")
+    os.chdir(BACKEND_DIR)
+    import uvicorn
+    try:
+        uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers, log_level="info")
+    finally:
+        if trainer is not None and trainer.poll() is None:
+            trainer.terminate()
@@ -0,0 +1,115 @@
+"""
+Action Log Service — persists behavioral events.
+
+record_actions() writes any number of validated events with bulk
+statements: one lookup of existing users, one executemany INSERT for new
+users (skipping any a concurrent request created first) and one for
+transactions, plus the feature-state fold. It backs both the synchronous
+/v1/log-action path and the optional write-behind mode, where events are
+acknowledged immediately and flushed in batches.
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from db import AsyncSessionLocal, chunked, dialect_insert
+from models.orm_models import User, Transaction
+from services import feature_state
+from services.score_cache import invalidate_on_commit
+from services.write_behind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_FIELDS = (
+    "user_hash", "action_type", "timestamp", "order_value", "product_category",
+    "product_id", "size_variant", "delivery_date", "return_date", "order_id",
+)
+
+
+async def record_actions(db: AsyncSession, events: List[Dict[str, Any]]) -> None:
+    """
+    Persist events (dicts with TRANSACTION_FIELDS plus store_id) in order.
+    Unknown users are created from their first event in the batch.
+    """
+    user_hashes = list(dict.fromkeys(e["user_hash"] for e in events))
+    existing = set()
+    for chunk in chunked(user_hashes):
+        result = await db.execute(select(User.user_hash).where(User.user_hash.in_(chunk)))
+        existing.update(result.scalars())
+
+    new_users: Dict[str, Dict[str, Any]] = {}
+    for e in events:
+        if e["user_hash"] not in existing and e["user_hash"] not in new_users:
+            new_users[e["user_hash"]] = {
+                "user_hash": e["user_hash"],
+                "store_id": e.get("store_id"),
+                "first_seen_at": e["timestamp"],
+            }
+    if new_users:
+        await db.execute(
+            dialect_insert(User).on_conflict_do_nothing(index_elements=[User.user_hash]),
+            list(new_users.values()),
+        )
+
+    # Fold into feature aggregates before the rows land (rebuilds read history)
+    await feature_state.record_actions(db, events, new_users=new_users.keys())
+    await db.execute(insert(Transaction), [{f: e.get(f) for f in TRANSACTION_FIELDS} for e in events])
+
+    for user_hash in user_hashes:
+        invalidate_on_commit(db, user_hash)
+
+
+# ── Write-behind mode ─────────────────────────────────────────────────────────
+_writer: Optional[WriteBehindQueue] = None
+
+
+async def _flush(batch: List[Dict[str, Any]]) -> None:
+    async with AsyncSessionLocal() as db:
+        await record_actions(db, batch)
+        await db.commit()
+
+
+def start_writer() -> None:
+    """Start the write-behind queue if enabled in settings (app startup)."""
+    global _writer
+    settings = get_settings()
+    if not settings.write_behind_enabled:
+        return
+    _writer = WriteBehindQueue(
+        "log-action",
+        _flush,
+        batch_size=settings.write_behind_batch_size,
+        flush_interval_ms=settings.write_behind_flush_ms,
+        max_queue=settings.write_behind_queue_size,
+    )
+    _writer.start()
+    logger.info(f"✅ Write-behind enabled for {settings.write_behind_actions} "
+                f"(batch {settings.write_behind_batch_size}, {settings.write_behind_flush_ms} ms)")
+
+
+async def stop_writer() -> None:
+    """Flush queued events and stop the writer (app shutdown)."""
+    global _writer
+    if _writer is not None:
+        logger.info(f"Flushing {_writer.qsize()} queued actions...")
+        await _writer.stop()
+        _writer = None
+
+
+def queue_depth() -> int:
+    """Events waiting for the write-behind writer (0 when it is off)."""
+    return _writer.qsize() if _writer is not None else 0
+
+
+def enqueue(event: Dict[str, Any]) -> bool:
+    """
+    Hand an event to the write-behind queue. False when write-behind is off,
+    not enabled for this action type, or the queue is full — the caller
+    then writes it synchronously.
+    """
+    if _writer is None or event["action_type"] not in get_settings().write_behind_actions:
+        return False
+    return _writer.offer(event)
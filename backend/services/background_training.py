@@ -0,0 +1,79 @@
+"""
+Background Training — trains the model without delaying startup.
+
+When no model is on disk the app starts immediately on the rule-based
+fallback, and startup_train.py runs in a separate process (so the
+CPU-heavy fit never competes with request handling for the GIL). When it
+finishes, the new artifacts are swapped in through
+model_service.reload_model(). Progress is reported on /health.
+"""
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import get_settings
+from services import model_service
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+_task: Optional[asyncio.Task] = None
+_process: Optional[asyncio.subprocess.Process] = None
+_status: Dict[str, Any] = {"state": "idle"}
+
+
+async def _run() -> None:
+    global _process
+    settings = get_settings()
+    started = time.monotonic()
+    _status.update(state="training", error=None)
+    logger.info("🔧 ML model not found on disk. Training in the background; serving rule-based scores meanwhile...")
+    try:
+        _process = await asyncio.create_subprocess_exec(
+            sys.executable, str(BACKEND_DIR / "startup_train.py"), "--train-only",
+            cwd=str(BACKEND_DIR),
+        )
+        code = await _process.wait()
+        if code != 0:
+            raise RuntimeError(f"training process exited with code {code}")
+        await model_service.reload_model(settings.model_path, settings.feature_names_path, settings.flat_model_path)
+        _status.update(state="ready", seconds=round(time.monotonic() - started, 1))
+        logger.info(f"✅ Background training complete in {_status['seconds']}s")
+    except asyncio.CancelledError:
+        _status.update(state="cancelled")
+        raise
+    except Exception as e:
+        _status.update(state="failed", error=str(e))
+        logger.error(f"❌ Background training failed: {e}")
+        logger.warning("⚠️  Continuing with rule-based scoring.")
+    finally:
+        _process = None
+
+
+def start() -> None:
+    """Kick off training unless one is already running (app startup)."""
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.get_running_loop().create_task(_run(), name="background-training")
+
+
+async def stop() -> None:
+    """Abort a training run still in progress (app shutdown)."""
+    global _task
+    if _process is not None and _process.returncode is None:
+        _process.terminate()
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+def status() -> Dict[str, Any]:
+    return dict(_status)
@@ -0,0 +1,229 @@
+"""
+Feature State Service — persisted per-user behavioral aggregates.
+
+Every logged action is folded into the user's UserFeatureState row, so
+risk scoring reads one row instead of replaying the transaction history.
+Users that predate the aggregate table are rebuilt from their full
+history on first access.
+
+Writers lock the users they fold into before reading their rows, so
+concurrent actions for one user apply one after another instead of
+overwriting each other. repair_states() rebuilds rows from history.
+"""
+import json
+import math
+from collections import defaultdict
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from sqlalchemy import false, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import chunked, dialect_insert
+from models.orm_models import User, Transaction, UserFeatureState
+from features.engineer import FOLDED_ACTIONS, new_feature_state, update_feature_state
+
+
+# Column-only reads: rows come back as lightweight mappings, skipping ORM
+# identity-map and relationship bookkeeping on the scoring path
+_STATE_TABLE = UserFeatureState.__table__
+_EVENT_COLUMNS = (
+    Transaction.action_type,
+    Transaction.product_id,
+    Transaction.product_category,
+    Transaction.order_value,
+    Transaction.size_variant,
+    Transaction.delivery_date,
+    Transaction.return_date,
+)
+
+
+def _state_from_row(row: Mapping[str, Any]) -> Dict[str, Any]:
+    product_sizes = defaultdict(set)
+    for product_id, sizes in json.loads(row["product_sizes"] or "{}").items():
+        product_sizes[product_id].update(sizes)
+    return {
+        "purchase_count": row["purchase_count"],
+        "return_count": row["return_count"],
+        "gap_days_sum": row["gap_days_sum"],
+        "gap_count": row["gap_count"],
+        "order_value_sum": row["order_value_sum"],
+        "order_value_count": row["order_value_count"],
+        "categories": set(json.loads(row["categories"] or "[]")),
+        "product_sizes": product_sizes,
+    }
+
+
+def _row_values(user_hash: str, state: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "user_hash": user_hash,
+        "purchase_count": state["purchase_count"],
+        "return_count": state["return_count"],
+        "gap_days_sum": state["gap_days_sum"],
+        "gap_count": state["gap_count"],
+        "order_value_sum": state["order_value_sum"],
+        "order_value_count": state["order_value_count"],
+        "categories": json.dumps(sorted(state["categories"])),
+        "product_sizes": json.dumps({p: sorted(s) for p, s in state["product_sizes"].items()}),
+        "updated_at": datetime.now(timezone.utc),
+    }
+
+
+async def _rebuild(db: AsyncSession, user_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fold complete transaction histories into fresh aggregates (one per user)."""
+    states = {user_hash: new_feature_state() for user_hash in user_hashes}
+    for chunk in chunked(user_hashes):
+        result = await db.execute(
+            select(Transaction.user_hash, *_EVENT_COLUMNS)
+            .where(Transaction.user_hash.in_(chunk))
+            .order_by(Transaction.user_hash, Transaction.timestamp)
+        )
+        for user_hash, events in groupby(result.mappings(), key=lambda e: e["user_hash"]):
+            state = states[user_hash]
+            for event in events:
+                update_feature_state(state, event)
+    return states
+
+
+async def _lock_users(db: AsyncSession, user_hashes: List[str]) -> None:
+    """
+    Hold the users' state rows against other writers until commit. Reads
+    after this see the latest committed aggregate, so concurrent folds for
+    one user apply in turn rather than overwriting each other.
+    """
+    if db.bind.dialect.name == "sqlite":
+        # SQLite has one database-wide write lock, taken by a transaction's
+        # first write statement — even one that matches no rows
+        await db.execute(
+            update(_STATE_TABLE).where(false()).values(updated_at=_STATE_TABLE.c.updated_at)
+        )
+        return
+    for chunk in chunked(sorted(user_hashes)):
+        await db.execute(
+            select(User.user_hash).where(User.user_hash.in_(chunk))
+            .order_by(User.user_hash).with_for_update()
+        )
+
+
+async def _read_rows(db: AsyncSession, user_hashes: List[str]) -> Dict[str, Mapping[str, Any]]:
+    rows: Dict[str, Mapping[str, Any]] = {}
+    for chunk in chunked(user_hashes):
+        result = await db.execute(select(_STATE_TABLE).where(_STATE_TABLE.c.user_hash.in_(chunk)))
+        rows.update({row["user_hash"]: row for row in result.mappings()})
+    return rows
+
+
+async def _upsert(db: AsyncSession, values: List[Dict[str, Any]]) -> None:
+    """Write whole rows, replacing any row a reader inserted meanwhile."""
+    stmt = dialect_insert(_STATE_TABLE)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_STATE_TABLE.c.user_hash],
+        set_={c.name: stmt.excluded[c.name] for c in _STATE_TABLE.c if not c.primary_key},
+    )
+    await db.execute(stmt, values)
+
+
+async def load_state(db: AsyncSession, user_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Current aggregate for a user, or None if the user is not registered.
+    User lookup and state read are one joined query; users without a state
+    row are rebuilt from history and the row is persisted.
+    """
+    return (await load_states(db, [user_hash])).get(user_hash)
+
+
+async def record_actions(db: AsyncSession, events: List[Dict[str, Any]], new_users: Iterable[str] = ()) -> None:
+    """
+    Fold newly logged actions (in order) into their users' persisted
+    aggregates. Must run before the actions' transactions are inserted,
+    since users without a state row are rebuilt from stored history.
+    `new_users` were created in this batch and have no history to rebuild.
+    Actions that cannot change an aggregate (View, AddToCart) are skipped,
+    so a batch of them locks, reads and writes no state rows at all.
+    """
+    new_users = set(new_users)
+    by_user: Dict[str, List[Dict[str, Any]]] = {}
+    for event in events:
+        if event["action_type"] in FOLDED_ACTIONS:
+            by_user.setdefault(event["user_hash"], []).append(event)
+    if not by_user:
+        return
+
+    await _lock_users(db, list(by_user))
+    rows = await _read_rows(db, list(by_user))
+    rebuilt = await _rebuild(db, [h for h in by_user if h not in rows and h not in new_users])
+
+    updates, inserts = [], []
+    for user_hash, user_events in by_user.items():
+        row = rows.get(user_hash)
+        if row is not None:
+            state = _state_from_row(row)
+        else:
+            state = rebuilt.get(user_hash) or new_feature_state()
+        for event in user_events:
+            update_feature_state(state, event)
+        (updates if row is not None else inserts).append(_row_values(user_hash, state))
+
+    if updates:
+        await db.execute(update(UserFeatureState), updates)
+    if inserts:
+        await _upsert(db, inserts)
+
+
+def _drifted(stored: Dict[str, Any], rebuilt: Dict[str, Any]) -> bool:
+    # Order values are float sums: tolerate rounding from a different fold order
+    return any(
+        not math.isclose(stored[k], v, rel_tol=1e-9, abs_tol=1e-6) if k == "order_value_sum" else stored[k] != v
+        for k, v in rebuilt.items()
+    )
+
+
+async def repair_states(db: AsyncSession, user_hashes: List[str]) -> List[str]:
+    """
+    Rebuild the users' aggregates from their transaction history and
+    rewrite every row that has drifted from it (or is missing). Returns the
+    user_hashes whose rows were rewritten; unregistered users are ignored.
+    """
+    await _lock_users(db, user_hashes)
+    registered = []
+    for chunk in chunked(user_hashes):
+        result = await db.execute(select(User.user_hash).where(User.user_hash.in_(chunk)))
+        registered.extend(result.scalars())
+    rows = await _read_rows(db, registered)
+    rebuilt = await _rebuild(db, registered)
+
+    repaired = [h for h, state in rebuilt.items() if h not in rows or _drifted(_state_from_row(rows[h]), state)]
+    if repaired:
+        await _upsert(db, [_row_values(h, rebuilt[h]) for h in repaired])
+    return repaired
+
+
+async def load_states(db: AsyncSession, user_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Aggregates for many users, keyed by user_hash.
+    Users without a users row are absent from the result; registered users
+    without a state row are rebuilt from one history query grouped by user.
+    """
+    states: Dict[str, Dict[str, Any]] = {}
+    missing: List[str] = []
+    for chunk in chunked(user_hashes):
+        result = await db.execute(
+            select(User.user_hash.label("registered_hash"), _STATE_TABLE)
+            .outerjoin(_STATE_TABLE, _STATE_TABLE.c.user_hash == User.user_hash)
+            .where(User.user_hash.in_(chunk))
+        )
+        for row in result.mappings():
+            if row["user_hash"] is not None:
+                states[row["user_hash"]] = _state_from_row(row)
+            else:
+                missing.append(row["registered_hash"])
+
+    # Scoring may race another reader (or a writer) to the first row for a
+    # user: keep whichever row landed first, it is at least as current
+    rebuilt = await _rebuild(db, missing)
+    if rebuilt:
+        stmt = dialect_insert(_STATE_TABLE).on_conflict_do_nothing(index_elements=[_STATE_TABLE.c.user_hash])
+        await db.execute(stmt, [_row_values(h, state) for h, state in rebuilt.items()])
+    states.update(rebuilt)
+    return states
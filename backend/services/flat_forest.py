@@ -0,0 +1,181 @@
+"""
+Flat Forest — array-backed evaluator for the trained RandomForest.
+
+The forest is flattened into contiguous NumPy arrays (one row per node
+across all trees) and scored by walking every tree in lock-step for a
+whole batch at once. This reproduces RandomForestClassifier.predict_proba
+without importing scikit-learn on the serving path.
+
+Leaf nodes point to themselves, so the traversal simply runs max_depth
+steps with no per-node branching.
+
+Two on-disk formats:
+  fraud_model.flat/  — directory of raw .npy arrays plus meta.json; loaded
+                       with mmap_mode="r", so every worker process maps the
+                       same page-cache pages instead of holding its own copy
+  fraud_model.npz    — single-file archive, read fully into memory
+"""
+import json
+import os
+from typing import Any, Dict
+
+import numpy as np
+
+TREE_LEAF = -1
+_NODE_ARRAYS = ("feature", "threshold", "left", "right", "value")
+_META_FILE = "meta.json"
+
+
+class FlatForest:
+    """Drop-in replacement for a fitted forest's predict_proba()."""
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth: int, n_features: int):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value            # P(fraud) at each leaf (unused at split nodes)
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    # ── Export ────────────────────────────────────────────────────────────────
+    @classmethod
+    def from_sklearn(cls, model: Any, positive_class: int = 1) -> "FlatForest":
+        """Flatten a fitted RandomForestClassifier (read via attributes only)."""
+        class_idx = list(model.classes_).index(positive_class)
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for est in model.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            node_ids = np.arange(n, dtype=np.int32)
+            is_leaf = tree.children_left == TREE_LEAF
+
+            counts = tree.value[:, 0, :]
+            proba = counts[:, class_idx] / counts.sum(axis=1)
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold).astype(np.float64))
+            lefts.append((np.where(is_leaf, node_ids, tree.children_left) + offset).astype(np.int32))
+            rights.append((np.where(is_leaf, node_ids, tree.children_right) + offset).astype(np.int32))
+            values.append(proba.astype(np.float64))
+            roots.append(offset)
+
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.array(roots, dtype=np.int32),
+            max_depth=max_depth,
+            n_features=model.n_features_in_,
+        )
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "left": self.left,
+            "right": self.right,
+            "value": self.value,
+            "roots": self.roots,
+            "max_depth": np.array(self.max_depth),
+            "n_features": np.array(self.n_features),
+        }
+
+    def save(self, path: str) -> None:
+        """Write an .npz archive, or a memory-mappable directory for any other path."""
+        if path.endswith(".npz"):
+            np.savez(path, **self._arrays())
+            return
+
+        os.makedirs(path, exist_ok=True)
+        for name in _NODE_ARRAYS + ("roots",):
+            # Replace by rename: processes mapping the old file keep a valid inode
+            tmp = os.path.join(path, f".{name}.tmp.npy")
+            np.save(tmp, np.ascontiguousarray(getattr(self, name)))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+        # Written last — the loader checks array sizes against it
+        meta = {"max_depth": self.max_depth, "n_features": self.n_features,
+                "n_trees": self.n_trees, "n_nodes": self.n_nodes}
+        tmp = os.path.join(path, f".{_META_FILE}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, _META_FILE))
+
+    @classmethod
+    def load(cls, path: str) -> "FlatForest":
+        """Load either format; directory arrays are memory-mapped read-only."""
+        if os.path.isfile(path):
+            with np.load(path) as data:
+                return cls(**{name: data[name] for name in data.files})
+
+        with open(os.path.join(path, _META_FILE)) as f:
+            meta = json.load(f)
+        arrays = {
+            # asarray drops the np.memmap subclass (cheaper indexing), keeping the mapping
+            name: np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+            for name in _NODE_ARRAYS + ("roots",)
+        }
+        if len(arrays["roots"]) != meta["n_trees"] or any(len(arrays[n]) != meta["n_nodes"] for n in _NODE_ARRAYS):
+            raise ValueError(f"Flat forest at {path} is incomplete or mid-write")
+        return cls(**arrays, max_depth=meta["max_depth"], n_features=meta["n_features"])
+
+    @staticmethod
+    def mtime(path: str) -> float:
+        """Modification time of an export (meta.json for the directory format)."""
+        return os.path.getmtime(path if os.path.isfile(path) else os.path.join(path, _META_FILE))
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return bool(path) and (os.path.isfile(path) or os.path.isfile(os.path.join(path, _META_FILE)))
+
+    # ── Inference ─────────────────────────────────────────────────────────────
+    def predict_fraud(self, X) -> np.ndarray:
+        """P(fraud) for each row of X, shape (n_samples,)."""
+        # Trees split on float32 inputs, exactly as scikit-learn does
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node].mean(axis=1)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities, shape (n_samples, 2), as predict_proba() returns."""
+        fraud = self.predict_fraud(X)
+        return np.column_stack([1.0 - fraud, fraud])
+
+
+def check_parity(model: Any, flat: FlatForest, X, atol: float = 1e-9) -> float:
+    """
+    Compare the flat evaluator with the source model on X.
+    Returns the max absolute difference; raises ValueError beyond atol.
+    """
+    class_idx = list(model.classes_).index(1)
+    expected = model.predict_proba(X)[:, class_idx]
+    diff = float(np.max(np.abs(expected - flat.predict_fraud(X)))) if len(X) else 0.0
+    if diff > atol:
+        raise ValueError(f"Flat forest diverges from predict_proba (max diff {diff:.3g})")
+    return diff
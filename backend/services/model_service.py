@@ -3,18 +3,23 @@ Model Service — Loads and runs the fraud detection model (RandomForest / XGBoo
 
 Falls back to a rule-based heuristic score if the model file
 hasn't been trained yet (allows frontend demo without running ML pipeline first).
+
+The active model, its feature order and its version live in one immutable
+LoadedModel that is replaced in a single assignment. reload_model() builds
+and validates the replacement off the event loop before swapping it in, so
+in-flight predictions finish on the model they started with.
 """
 import os
 import json
+import asyncio
+import hashlib
 import logging
-from typing import Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 import numpy as np
 
-logger = logging.getLogger(__name__)
+from services.flat_forest import FlatForest
 
-_model = None
-_feature_names: List[str] = []
-_model_type: str = "none"
+logger = logging.getLogger(__name__)
 
 EXPECTED_FEATURES = [
     "return_to_purchase_ratio",
@@ -26,44 +31,164 @@ EXPECTED_FEATURES = [
     "total_returns",
 ]
 
+HEURISTIC_VERSION = "heuristic"
+
+# Canary batch every new model must score before it is swapped in:
+# an empty history, a typical legitimate shopper and a wardrobing pattern
+CANARY_FEATURES = [
+    dict.fromkeys(EXPECTED_FEATURES, 0.0),
+    {"return_to_purchase_ratio": 0.1, "temporal_gap_days": 14.0, "size_variation_flag": 0.0,
+     "category_diversity": 0.4, "avg_order_value": 2500.0, "total_purchases": 10.0, "total_returns": 1.0},
+    {"return_to_purchase_ratio": 0.9, "temporal_gap_days": 1.5, "size_variation_flag": 1.0,
+     "category_diversity": 0.05, "avg_order_value": 9000.0, "total_purchases": 20.0, "total_returns": 18.0},
+]
+
+
+class LoadedModel:
+    """A model together with everything needed to score and attribute it."""
+    __slots__ = ("model", "feature_names", "model_type", "version", "source")
+
+    def __init__(self, model: Any, feature_names: List[str], model_type: str, version: str, source: str):
+        self.model = model
+        self.feature_names = feature_names
+        self.model_type = model_type
+        self.version = version
+        self.source = source
 
-def load_model(model_path: str, feature_names_path: str):
-    """Load the trained model at application startup."""
-    global _model, _feature_names
+
+_active = LoadedModel(None, EXPECTED_FEATURES, "none", HEURISTIC_VERSION, "")
+_reload_lock: Optional[asyncio.Lock] = None
+_load_error: Optional[str] = None
+
+
+def _flat_is_current(flat_model_path: str, model_path: str) -> bool:
+    """The flat export is only trusted if it is at least as new as the pickle."""
+    if not FlatForest.exists(flat_model_path):
+        return False
+    return not os.path.exists(model_path) or FlatForest.mtime(flat_model_path) >= os.path.getmtime(model_path)
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    paths = [path] if os.path.isfile(path) else [os.path.join(path, n) for n in sorted(os.listdir(path))]
+    for p in paths:
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def _build(model_path: str, feature_names_path: str, flat_model_path: Optional[str] = None) -> LoadedModel:
+    """
+    Load model artifacts from disk without touching the active model.
+    Prefers the flattened forest export (NumPy only, no scikit-learn);
+    falls back to the joblib pickle.
+    """
+    if os.path.exists(feature_names_path):
+        with open(feature_names_path) as f:
+            feature_names = json.load(f)
+    else:
+        feature_names = EXPECTED_FEATURES
+
+    # The version names the trained artifact: the pickle if present, else the export
+    if os.path.exists(model_path):
+        version = "v-" + _file_digest(model_path)[:12]
+    elif FlatForest.exists(flat_model_path):
+        version = "v-" + _file_digest(flat_model_path)[:12]
+    else:
+        return LoadedModel(None, feature_names, "none", HEURISTIC_VERSION, "")
+
+    if _flat_is_current(flat_model_path, model_path):
+        model = FlatForest.load(flat_model_path)
+        return LoadedModel(model, feature_names, "flat_forest", version, flat_model_path)
+
+    import joblib
+    model = joblib.load(model_path)
+    # Serving batches are tiny; joblib's thread fan-out costs more than it saves
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = 1
+    return LoadedModel(model, feature_names, type(model).__name__, version, model_path)
+
+
+def validate(candidate: LoadedModel) -> None:
+    """Score the canary batch with `candidate`; raises ValueError if it misbehaves."""
+    if candidate.model is None:
+        return
+    missing = set(EXPECTED_FEATURES) - set(candidate.feature_names)
+    if missing:
+        raise ValueError(f"Model is missing features {sorted(missing)}")
+    matrix = np.array([[f.get(name, 0.0) for name in candidate.feature_names] for f in CANARY_FEATURES])
+    proba = np.asarray(candidate.model.predict_proba(matrix))
+    if proba.shape != (len(CANARY_FEATURES), 2):
+        raise ValueError(f"predict_proba returned shape {proba.shape}")
+    if not np.all(np.isfinite(proba)) or proba.min() < 0.0 or proba.max() > 1.0:
+        raise ValueError("predict_proba returned values outside [0, 1]")
+
+
+def _swap(candidate: LoadedModel) -> None:
+    global _active
+    previous = _active
+    _active = candidate
+    if candidate.model is None:
+        logger.warning("⚠️  No trained model on disk. Using rule-based fallback.")
+    else:
+        logger.info(f"✅ Model {candidate.version} ({candidate.model_type}) loaded from {candidate.source}"
+                    + (f", replacing {previous.version}" if previous.model is not None else ""))
+
+
+def load_model(model_path: str, feature_names_path: str, flat_model_path: Optional[str] = None):
+    """
+    Load the trained model at application startup (falls back to the
+    heuristic). Artifacts that exist but fail to load or validate are
+    reported by load_error().
+    """
+    global _load_error
+    _load_error = None
     try:
-        import joblib
-        if os.path.exists(model_path):
-            _model = joblib.load(model_path)
-            logger.info(f"✅ ML model loaded from {model_path}")
-        else:
-            logger.warning(f"⚠️  Model not found at {model_path}. Using rule-based fallback.")
-
-        if os.path.exists(feature_names_path):
-            with open(feature_names_path) as f:
-                _feature_names = json.load(f)
-        else:
-            _feature_names = EXPECTED_FEATURES
+        candidate = _build(model_path, feature_names_path, flat_model_path)
+        validate(candidate)
     except Exception as e:
         logger.error(f"Failed to load model: {e}")
-        _model = None
-        _feature_names = EXPECTED_FEATURES
+        _load_error = str(e)
+        candidate = LoadedModel(None, EXPECTED_FEATURES, "none", HEURISTIC_VERSION, "")
+    _swap(candidate)
 
 
-def predict(features: Dict[str, float]) -> float:
+async def reload_model(model_path: str, feature_names_path: str, flat_model_path: Optional[str] = None) -> LoadedModel:
     """
-    Returns a fraud probability in [0, 1].
-    If model is loaded -> uses XGBoost.
-    Fallback -> rule-based heuristic for demo purposes.
+    Load, validate and atomically activate the model currently on disk.
+    Loading runs in a worker thread; on any failure the active model is kept
+    and the exception propagates. Concurrent reloads are serialized.
     """
-    if _model is not None:
-        try:
-            feature_vector = np.array([[features.get(f, 0.0) for f in _feature_names]])
-            proba = _model.predict_proba(feature_vector)[0][1]
-            return float(proba)
-        except Exception as e:
-            logger.error(f"Model inference failed: {e}. Falling back to heuristic.")
+    global _reload_lock, _load_error
+    if _reload_lock is None:
+        _reload_lock = asyncio.Lock()
+    async with _reload_lock:
+        candidate = await asyncio.to_thread(_build, model_path, feature_names_path, flat_model_path)
+        if candidate.model is None and _active.model is not None:
+            raise FileNotFoundError(f"No model found at {model_path}; keeping {_active.version}")
+        await asyncio.to_thread(validate, candidate)
+        _load_error = None
+        if candidate.version != _active.version or candidate.source != _active.source:
+            _swap(candidate)
+        return _active
+
+
+def current() -> LoadedModel:
+    return _active
+
+
+def is_loaded() -> bool:
+    return _active.model is not None
 
-    # --- Rule-based fallback heuristic ---
+
+def load_error() -> Optional[str]:
+    """Why the model on disk was rejected at startup; None if it loaded or is absent."""
+    return _load_error
+
+
+def _heuristic(features: Dict[str, float]) -> float:
+    """Rule-based fallback heuristic for demo purposes."""
     score = 0.0
     rpr = features.get("return_to_purchase_ratio", 0)
     gap = features.get("temporal_gap_days", 30)
@@ -81,6 +206,41 @@ def predict(features: Dict[str, float]) -> float:
     return min(score, 1.0)
 
 
+def predict(features: Dict[str, float]) -> float:
+    """
+    Returns a fraud probability in [0, 1].
+    If model is loaded -> uses XGBoost.
+    Fallback -> rule-based heuristic for demo purposes.
+    """
+    return predict_many([features])[0]
+
+
+def predict_many(batch: List[Dict[str, float]]) -> List[float]:
+    """
+    Fraud probabilities for several feature dicts with a single
+    predict_proba call, amortising the model's fixed per-call overhead.
+    """
+    return score_batch(batch)[0]
+
+
+def score_batch(batch: List[Dict[str, float]]) -> Tuple[List[float], str]:
+    """predict_many() plus the version of the model that produced the scores."""
+    active = _active  # one snapshot for the whole batch, even if a reload swaps mid-call
+    if active.model is not None and batch:
+        try:
+            matrix = np.array([[f.get(name, 0.0) for name in active.feature_names] for f in batch])
+            return [float(p) for p in active.model.predict_proba(matrix)[:, 1]], active.version
+        except Exception as e:
+            logger.error(f"Model inference failed: {e}. Falling back to heuristic.")
+
+    return [_heuristic(f) for f in batch], HEURISTIC_VERSION
+
+
+def model_version() -> str:
+    """Version tag recorded with every score (and part of the score cache key)."""
+    return _active.version
+
+
 def score_to_100(proba: float) -> int:
     """Convert [0,1] probability to integer 0–100 risk score."""
     return int(round(proba * 100))
@@ -0,0 +1,71 @@
+"""
+Model Watcher — reloads the model when its files change on disk.
+
+Polls the modification times of the model pickle, feature list and flat
+export every MODEL_WATCH_INTERVAL_SECONDS. A change is acted on once the
+files have been stable for one further interval (so a half-copied
+artifact is not picked up); the reload itself goes through
+model_service.reload_model(), which validates before swapping. Each
+worker process runs its own watcher, so all of them follow a deploy.
+"""
+import asyncio
+import logging
+import os
+from typing import Optional, Tuple
+
+from config import get_settings
+from services import model_service
+from services.flat_forest import FlatForest
+
+logger = logging.getLogger(__name__)
+
+_task: Optional[asyncio.Task] = None
+
+
+def _fingerprint() -> Tuple[float, ...]:
+    settings = get_settings()
+    stamps = []
+    for path in (settings.model_path, settings.feature_names_path):
+        stamps.append(os.path.getmtime(path) if os.path.exists(path) else 0.0)
+    flat = settings.flat_model_path
+    stamps.append(FlatForest.mtime(flat) if FlatForest.exists(flat) else 0.0)
+    return tuple(stamps)
+
+
+async def _watch(interval: float, loaded: Tuple[float, ...]) -> None:
+    settings = get_settings()
+    while True:
+        await asyncio.sleep(interval)
+        seen = _fingerprint()
+        if seen == loaded:
+            continue
+        # Wait until the files stop changing before loading them
+        await asyncio.sleep(interval)
+        if _fingerprint() != seen:
+            continue
+        loaded = seen
+        try:
+            await model_service.reload_model(settings.model_path, settings.feature_names_path, settings.flat_model_path)
+        except Exception as e:
+            logger.error(f"❌ Model reload after file change rejected, keeping {model_service.model_version()}: {e}")
+
+
+def start() -> None:
+    """Start polling if MODEL_WATCH_INTERVAL_SECONDS > 0 (app startup)."""
+    global _task
+    interval = get_settings().model_watch_interval_seconds
+    if interval > 0:
+        # Baseline taken now, right after the startup load, not when the task first runs
+        _task = asyncio.get_running_loop().create_task(_watch(interval, _fingerprint()), name="model-watcher")
+        logger.info(f"✅ Watching model files every {interval:g}s")
+
+
+async def stop() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,123 @@
+"""
+Score Cache — in-process LRU of recent risk scores.
+
+Checkout pages ask for the same user's score repeatedly within seconds.
+Entries are keyed by user_hash and tagged with the model version that
+produced them; they expire after a TTL, are evicted least-recently-used
+beyond a size bound, and are invalidated whenever a new action is
+recorded for the user.
+
+A score computed from state read before an invalidation must not be
+stored after it: callers take generation() before reading the user's
+state and pass it to put(), which discards the score if the user has
+been invalidated since.
+
+The cache is per process: with several workers another worker's
+invalidation is not seen, so the TTL bounds how stale a score can get.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import get_settings
+
+_PENDING_KEY = "score_cache_invalidate"
+
+
+class ScoreCache:
+    """Bounded LRU with per-entry TTL; one entry per user."""
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, float, Any]]" = OrderedDict()
+        self._lock = Lock()
+        # Invalidation clock: each invalidate() ticks it and stamps the user.
+        # Stamps are kept for the most recent `maxsize` users; a generation
+        # older than the newest forgotten stamp can no longer be checked.
+        self._clock = 0
+        self._stamps: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, user_hash: str, model_version: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_hash)
+            if entry is None:
+                return None
+            version, expires_at, value = entry
+            if version != model_version or expires_at < time.monotonic():
+                del self._entries[user_hash]
+                return None
+            self._entries.move_to_end(user_hash)
+            return value
+
+    def generation(self) -> int:
+        """Token to take before reading the state a score is computed from."""
+        return self._clock
+
+    def put(self, user_hash: str, model_version: str, value: Any, generation: int) -> None:
+        """Store a score, unless the user was invalidated after `generation`."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation < self._forgotten or self._stamps.get(user_hash, 0) > generation:
+                return
+            self._entries[user_hash] = (model_version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(user_hash)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_hash: str) -> None:
+        with self._lock:
+            self._entries.pop(user_hash, None)
+            self._clock += 1
+            self._stamps[user_hash] = self._clock
+            self._stamps.move_to_end(user_hash)
+            while len(self._stamps) > max(self.maxsize, 1):
+                self._forgotten = self._stamps.popitem(last=False)[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            # Scores already being computed are discarded too
+            self._clock += 1
+            self._stamps.clear()
+            self._forgotten = self._clock
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_settings = get_settings()
+cache = ScoreCache(_settings.score_cache_size, _settings.score_cache_ttl_seconds)
+
+
+def invalidate_on_commit(db: AsyncSession, user_hash: str) -> None:
+    """
+    Drop the user's cached score now and again once `db` commits, so a
+    score computed from the pre-commit state cannot linger in the cache.
+    """
+    cache.invalidate(user_hash)
+    db.sync_session.info.setdefault(_PENDING_KEY, set()).add(user_hash)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    for user_hash in session.info.pop(_PENDING_KEY, ()):
+        cache.invalidate(user_hash)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
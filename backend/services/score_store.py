@@ -0,0 +1,158 @@
+"""
+Score Store — bulk persistence of computed risk scores.
+
+Writes RiskScore audit rows with a single executemany INSERT and the
+matching users.risk_tier values with a single bulk UPDATE. On PostgreSQL
+a single score is written in one statement (see persist_score).
+
+In "background" persist mode (the default) scoring endpoints hand scores
+to record_scores(), which queues them and returns at once; a write-behind
+task commits them in batches off the request path. When the queue is
+full, SCORE_PERSIST_OVERFLOW picks between waiting for space ("block")
+and dropping the audit row ("drop").
+"""
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import DateTime, Numeric, String, Text, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from db import AsyncSessionLocal
+from models.orm_models import User, RiskScore
+from services.write_behind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+
+async def persist_scores(db: AsyncSession, scores: List[Dict[str, Any]]) -> None:
+    """
+    Persist scores for registered users. Each entry needs user_hash,
+    risk_score, risk_level, reason_codes (list) and model_version, and may
+    carry computed_at (defaults to now).
+    """
+    if not scores:
+        return
+    now = datetime.now(timezone.utc)
+    await db.execute(
+        insert(RiskScore),
+        [
+            {
+                "user_hash": s["user_hash"],
+                "risk_score": s["risk_score"],
+                "risk_level": s["risk_level"],
+                "reason_codes": json.dumps(s["reason_codes"]),
+                "model_version": s["model_version"],
+                "computed_at": s.get("computed_at") or now,
+            }
+            for s in scores
+        ],
+    )
+    await db.execute(
+        update(User),
+        [{"user_hash": s["user_hash"], "risk_tier": s["risk_level"]} for s in scores],
+    )
+
+
+async def persist_score(db: AsyncSession, score: Dict[str, Any]) -> None:
+    """
+    Persist one score (same keys as persist_scores). On PostgreSQL the tier
+    update and the audit insert go out as a single statement — a
+    data-modifying CTE whose RETURNING feeds the INSERT — so the write costs
+    one round-trip and is a no-op for unregistered users.
+    """
+    if db.bind.dialect.name != "postgresql":
+        await persist_scores(db, [score])
+        return
+
+    tiered = (
+        update(User)
+        .where(User.user_hash == score["user_hash"])
+        .values(risk_tier=score["risk_level"])
+        .returning(User.user_hash)
+        .cte("tiered")
+    )
+    await db.execute(
+        insert(RiskScore).from_select(
+            ["user_hash", "risk_score", "risk_level", "reason_codes", "model_version", "computed_at"],
+            select(
+                tiered.c.user_hash,
+                literal(score["risk_score"], Numeric(5, 2)),
+                literal(score["risk_level"], String),
+                literal(json.dumps(score["reason_codes"]), Text),
+                literal(score["model_version"], String),
+                literal(score.get("computed_at") or datetime.now(timezone.utc), DateTime),
+            ),
+        )
+    )
+
+
+# ── Background persistence ────────────────────────────────────────────────────
+_writer: Optional[WriteBehindQueue] = None
+dropped = 0
+
+
+async def _flush(batch: List[Dict[str, Any]]) -> None:
+    async with AsyncSessionLocal() as db:
+        await persist_scores(db, batch)
+        await db.commit()
+
+
+def start_writer() -> None:
+    """Start background persistence if SCORE_PERSIST_MODE=background (app startup)."""
+    global _writer
+    settings = get_settings()
+    if settings.score_persist_mode != "background":
+        return
+    _writer = WriteBehindQueue(
+        "risk-scores",
+        _flush,
+        batch_size=settings.score_persist_batch_size,
+        flush_interval_ms=settings.score_persist_flush_ms,
+        max_queue=settings.score_persist_queue_size,
+    )
+    _writer.start()
+    logger.info(f"✅ Background score persistence enabled (overflow: {settings.score_persist_overflow})")
+
+
+async def stop_writer() -> None:
+    """Flush queued scores and stop the writer (app shutdown)."""
+    global _writer
+    if _writer is not None:
+        logger.info(f"Flushing {_writer.qsize()} queued risk scores...")
+        await _writer.stop()
+        _writer = None
+
+
+def queue_depth() -> int:
+    """Scores waiting for the background writer (0 when persisting inline)."""
+    return _writer.qsize() if _writer is not None else 0
+
+
+async def record_scores(db: AsyncSession, scores: List[Dict[str, Any]]) -> None:
+    """
+    Persist scores computed by a request: queued for the background writer
+    when it is running, otherwise written inline within `db`'s transaction.
+    """
+    global dropped
+    if not scores:
+        return
+    if _writer is None:
+        if len(scores) == 1:
+            await persist_score(db, scores[0])
+        else:
+            await persist_scores(db, scores)
+        return
+
+    now = datetime.now(timezone.utc)
+    block = get_settings().score_persist_overflow == "block"
+    for score in scores:
+        score = {**score, "computed_at": score.get("computed_at") or now}
+        if block:
+            await _writer.put(score)
+        elif not _writer.offer(score):
+            dropped += 1
+            if dropped % 1000 == 1:
+                logger.warning(f"⚠️  Score queue full — dropped {dropped} audit rows so far")
@@ -0,0 +1,106 @@
+"""
+Write-Behind Queue — acknowledge now, persist in bulk later.
+
+Items are buffered in a bounded in-memory queue and handed to an async
+flush function in batches, whenever `batch_size` items are waiting or
+`flush_interval_ms` has passed since the first one arrived. stop()
+drains everything still queued, so call it from the app's shutdown.
+
+Callers choose the overflow policy: offer() refuses items when the queue
+is full, put() waits for space.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    def __init__(self, name: str, flush: Callable[[List[Any]], Awaitable[None]],
+                 batch_size: int, flush_interval_ms: float, max_queue: int):
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._flush = flush
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._has_items = asyncio.Event()
+        self._batch_ready = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+        self.flushed = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run(), name=f"write-behind:{self.name}")
+
+    async def stop(self) -> None:
+        """Flush everything still queued and stop the background task."""
+        self._closing = True
+        self._has_items.set()
+        self._batch_ready.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def offer(self, item: Any) -> bool:
+        """Enqueue without waiting; False if the queue is full or stopping."""
+        if self._closing:
+            return False
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            return False
+        self._notify()
+        return True
+
+    async def put(self, item: Any) -> None:
+        """Enqueue, waiting for space if the queue is full."""
+        await self._queue.put(item)
+        self._notify()
+
+    def _notify(self) -> None:
+        self._has_items.set()
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+
+    async def _run(self) -> None:
+        while True:
+            await self._has_items.wait()
+            if self._queue.qsize() < self.batch_size and not self._closing:
+                self._batch_ready.clear()
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if self._queue.empty():
+                self._has_items.clear()
+
+            if batch:
+                await self._flush_batch(batch)
+            if self._closing and self._queue.empty():
+                return
+
+    async def _flush_batch(self, batch: List[Any]) -> None:
+        try:
+            await self._flush(batch)
+            self.flushed += len(batch)
+            return
+        except Exception as e:
+            logger.error(f"[{self.name}] bulk flush of {len(batch)} items failed: {e}. Retrying one by one.")
+
+        # Isolate the bad item(s) so one failure doesn't drop the whole batch
+        for item in batch:
+            try:
+                await self._flush([item])
+                self.flushed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"[{self.name}] dropped item after failed write: {e}")
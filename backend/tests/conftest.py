@@ -0,0 +1,47 @@
+"""
+Test setup: a throwaway SQLite database and the rule-based model, so the
+suite needs no trained artifacts. Settings are read once at import time,
+hence the environment is set before any backend module is imported.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="returnguard-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite+aiosqlite:///{_TMP}/test.db",
+    "APP_ENV": "test",
+    "MODEL_PATH": os.path.join(_TMP, "missing.pkl"),
+    "FLAT_MODEL_PATH": os.path.join(_TMP, "missing.flat"),
+    "AUTO_TRAIN_ON_STARTUP": "false",
+    "SCORE_PERSIST_MODE": "inline",
+    "ADMIN_TOKEN": "test-token",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from db import engine  # noqa: E402
+from main import app  # noqa: E402
+
+
+@pytest.fixture
+def run_app():
+    """
+    run_app(scenario) runs `await scenario(client)` against the app (with
+    its lifespan) on a fresh event loop and returns the result.
+    """
+    def run(scenario):
+        async def main():
+            try:
+                async with app.router.lifespan_context(app):
+                    transport = httpx.ASGITransport(app=app)
+                    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                        return await scenario(client)
+            finally:
+                # Pooled aiosqlite connections belong to this event loop
+                await engine.dispose()
+        return asyncio.run(main())
+    return run
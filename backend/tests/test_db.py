@@ -0,0 +1,29 @@
+"""Startup brings an older SQLite database's indexes up to date."""
+from sqlalchemy import create_engine, inspect, text
+
+from db import Base, _upgrade_indexes
+from models import orm_models  # noqa: F401
+
+
+def test_upgrade_replaces_single_column_user_hash_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        # The schema before the composite history indexes
+        for table, composite in (("transactions", "idx_transactions_user_hash_timestamp"),
+                                 ("risk_scores", "idx_risk_scores_user_hash_computed_at")):
+            conn.execute(text(f"DROP INDEX {composite}"))
+            conn.execute(text(f"CREATE INDEX ix_{table}_user_hash ON {table} (user_hash)"))
+
+    with engine.begin() as conn:
+        created, dropped = _upgrade_indexes(conn)
+    assert sorted(created) == ["idx_risk_scores_user_hash_computed_at", "idx_transactions_user_hash_timestamp"]
+    assert sorted(dropped) == ["ix_risk_scores_user_hash", "ix_transactions_user_hash"]
+
+    inspector = inspect(engine)
+    names = {ix["name"] for ix in inspector.get_indexes("transactions")}
+    assert "idx_transactions_user_hash_timestamp" in names and "ix_transactions_user_hash" not in names
+    assert "ix_transactions_timestamp" in names
+    with engine.begin() as conn:
+        assert _upgrade_indexes(conn) == ([], [])
+    engine.dispose()
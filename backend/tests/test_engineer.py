@@ -0,0 +1,63 @@
+"""Fused and incremental feature extraction match the per-feature reference functions."""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from features import engineer
+from features.engineer import extract_features, features_from_state, new_feature_state, update_feature_state
+
+ACTIONS = ["View", "AddToCart", "Purchase", "ReturnRequest"]
+
+
+def _reference(history):
+    return {
+        "return_to_purchase_ratio": engineer.return_to_purchase_ratio(history),
+        "temporal_gap_days": engineer.temporal_gap_score(history),
+        "size_variation_flag": float(engineer.size_variation_flag(history)),
+        "category_diversity": engineer.category_diversity_score(history),
+        "avg_order_value": engineer.avg_order_value(history),
+        "total_purchases": float(engineer.total_purchases(history)),
+        "total_returns": float(engineer.total_returns(history)),
+    }
+
+
+def _folded(history):
+    state = new_feature_state()
+    for t in history:
+        update_feature_state(state, t)
+    return features_from_state(state)
+
+
+def _random_event(rng, actions=ACTIONS):
+    delivered = datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 300), hours=rng.randint(0, 23))
+    returned = delivered + timedelta(days=rng.randint(-2, 20), hours=rng.randint(0, 23))
+    as_text = rng.random() < 0.5
+    event = {
+        "action_type": rng.choice(actions),
+        "product_id": rng.choice([None, "", "P1", "P2", "P3"]),
+        "product_category": rng.choice([None, "", "Clothing", "Electronics", "Books"]),
+        "order_value": rng.choice([None, 0, 0.0, round(rng.uniform(1, 9000), 2), rng.randint(1, 500)]),
+        "size_variant": rng.choice([None, "", "S", "M", "L", "XL"]),
+        "delivery_date": rng.choice([None, delivered.isoformat() if as_text else delivered]),
+        "return_date": rng.choice([None, returned.isoformat() if as_text else returned]),
+    }
+    # Not every event carries every key
+    return {k: v for k, v in event.items() if k == "action_type" or rng.random() < 0.9}
+
+
+def _histories():
+    rng = random.Random(1234)
+    yield "empty", []
+    yield "views_only", [_random_event(rng, ["View", "AddToCart"]) for _ in range(5)]
+    yield "returns_only", [_random_event(rng, ["ReturnRequest"]) for _ in range(7)]
+    yield "purchases_only", [_random_event(rng, ["Purchase"]) for _ in range(9)]
+    for n in range(300):
+        yield f"random_{n}", [_random_event(rng) for _ in range(rng.randint(1, 60))]
+
+
+@pytest.mark.parametrize("history", [h for _, h in _histories()], ids=[name for name, _ in _histories()])
+def test_matches_reference_functions(history):
+    expected = _reference(history)
+    assert extract_features(history) == expected
+    assert _folded(history) == expected
@@ -0,0 +1,133 @@
+"""Persisted feature aggregates stay equal to a replay of the user's history."""
+import asyncio
+
+from sqlalchemy import delete, select, update
+
+from db import AsyncSessionLocal
+from features.engineer import extract_features, features_from_state
+from models.orm_models import Transaction, UserFeatureState
+from services import feature_state
+
+CATEGORIES = ["Clothing", "Electronics", "Footwear", "Books"]
+SIZES = ["S", "M", "L", "XL"]
+
+
+def _action(user_hash, i):
+    if i % 3 == 2:
+        return {"user_hash": user_hash, "action_type": "ReturnRequest", "product_id": f"P{i}",
+                "delivery_date": "2024-01-01T00:00:00", "return_date": f"2024-01-{2 + i % 9:02d}T00:00:00"}
+    return {"user_hash": user_hash, "action_type": "Purchase", "product_id": "P1",
+            "product_category": CATEGORIES[i % 4], "size_variant": SIZES[i % 4], "order_value": 100 + i}
+
+
+async def _stored_and_replayed(user_hash):
+    async with AsyncSessionLocal() as db:
+        state = await feature_state.load_state(db, user_hash)
+        result = await db.execute(
+            select(Transaction.action_type, Transaction.product_id, Transaction.product_category,
+                   Transaction.order_value, Transaction.size_variant, Transaction.delivery_date,
+                   Transaction.return_date)
+            .where(Transaction.user_hash == user_hash)
+            .order_by(Transaction.timestamp)
+        )
+        history = [dict(row) for row in result.mappings()]
+        await db.commit()
+    return features_from_state(state), extract_features(history)
+
+
+def test_concurrent_actions_match_history(run_app):
+    users = [f"race-{n}" for n in range(10)]
+
+    async def scenario(client):
+        for user_hash in users:
+            assert (await client.post("/v1/log-action", json=_action(user_hash, 0))).status_code == 200
+        responses = await asyncio.gather(*(
+            client.post("/v1/log-action", json=_action(user_hash, i))
+            for i in range(1, 21) for user_hash in users
+        ))
+        assert all(r.status_code == 200 for r in responses)
+        return [await _stored_and_replayed(user_hash) for user_hash in users]
+
+    for stored, replayed in run_app(scenario):
+        assert stored == replayed
+        assert stored["total_purchases"] == 14 and stored["total_returns"] == 7
+
+
+def test_concurrent_first_scores_of_legacy_user(run_app):
+    user_hash = "legacy-user"
+
+    async def scenario(client):
+        for i in range(5):
+            await client.post("/v1/log-action", json=_action(user_hash, i))
+        # A user from before the aggregate table: history but no state row
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(UserFeatureState).where(UserFeatureState.user_hash == user_hash))
+            await db.commit()
+        responses = await asyncio.gather(*(
+            client.post("/v1/get-risk-score", json={"user_hash": user_hash}) for _ in range(10)
+        ))
+        return responses, await _stored_and_replayed(user_hash)
+
+    responses, (stored, replayed) = run_app(scenario)
+    assert [r.status_code for r in responses] == [200] * 10
+    assert stored == replayed
+
+
+def test_rebuild_repairs_drifted_rows(run_app):
+    drifted, intact = "drifted-user", "intact-user"
+
+    async def scenario(client):
+        for user_hash in (drifted, intact):
+            for i in range(6):
+                await client.post("/v1/log-action", json=_action(user_hash, i))
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(UserFeatureState).where(UserFeatureState.user_hash == drifted)
+                .values(purchase_count=1, categories="[]")
+            )
+            await db.commit()
+        response = await client.post(
+            "/v1/admin/rebuild-feature-state",
+            json={"user_hashes": [drifted, intact, "unknown-user"]},
+            headers={"X-Admin-Token": "test-token"},
+        )
+        return response, await _stored_and_replayed(drifted)
+
+    response, (stored, replayed) = run_app(scenario)
+    assert response.status_code == 200
+    assert response.json()["repaired"] == 1 and response.json()["user_hashes"] == [drifted]
+    assert stored == replayed
+
+
+def test_concurrent_first_actions_of_new_user(run_app):
+    user_hash = "brand-new-user"
+
+    async def scenario(client):
+        responses = await asyncio.gather(*(
+            client.post("/v1/log-action", json=_action(user_hash, i)) for i in range(10)
+        ))
+        return responses, await _stored_and_replayed(user_hash)
+
+    responses, (stored, replayed) = run_app(scenario)
+    assert [r.status_code for r in responses] == [200] * 10
+    assert stored == replayed
+
+
+def test_views_leave_state_row_untouched(run_app):
+    user_hash = "browsing-user"
+
+    async def updated_at():
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(
+                select(UserFeatureState.updated_at).where(UserFeatureState.user_hash == user_hash)
+            )).scalar_one()
+
+    async def scenario(client):
+        await client.post("/v1/log-action", json=_action(user_hash, 0))
+        before = await updated_at()
+        for action_type in ("View", "AddToCart"):
+            await client.post("/v1/log-action", json={"user_hash": user_hash, "action_type": action_type})
+        return before, await updated_at()
+
+    before, after = run_app(scenario)
+    assert before == after
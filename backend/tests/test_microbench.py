@@ -0,0 +1,16 @@
+"""bench/microbench.py --compare reports no regressions for an unchanged tree."""
+import importlib.util
+from pathlib import Path
+
+_PATH = Path(__file__).resolve().parents[2] / "bench" / "microbench.py"
+_spec = importlib.util.spec_from_file_location("microbench", _PATH)
+microbench = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(microbench)
+
+
+def test_unchanged_tree_reports_no_regressions():
+    # Two runs of the same code: the first stands in for the saved baseline
+    baseline = microbench.run_cases("features")
+    again = microbench.run_cases("features")
+    assert set(again) == set(baseline) and len(baseline) == 4
+    assert microbench.compare(again, baseline, microbench.DEFAULT_THRESHOLD) == []
@@ -0,0 +1,68 @@
+"""A score computed before a user's action commits is never cached after it."""
+import asyncio
+
+from services import feature_state
+from services.score_cache import ScoreCache
+
+PURCHASE = {"action_type": "Purchase", "product_id": "P1", "product_category": "Clothing", "order_value": 999}
+RETURN = {"action_type": "ReturnRequest", "product_id": "P1",
+          "delivery_date": "2024-01-01T00:00:00", "return_date": "2024-01-02T00:00:00"}
+
+
+def test_put_discards_scores_from_before_an_invalidation():
+    cache = ScoreCache(maxsize=2, ttl_seconds=60)
+    generation = cache.generation()
+    cache.invalidate("a")
+    cache.put("a", "v1", "stale", generation)
+    assert cache.get("a", "v1") is None
+
+    cache.put("a", "v1", "fresh", cache.generation())
+    assert cache.get("a", "v1") == "fresh"
+    # Other users' invalidations don't affect the entry
+    generation = cache.generation()
+    cache.invalidate("b")
+    cache.put("a", "v1", "fresh again", generation)
+    assert cache.get("a", "v1") == "fresh again"
+
+
+def test_forgotten_stamps_err_on_the_side_of_not_caching():
+    cache = ScoreCache(maxsize=2, ttl_seconds=60)
+    generation = cache.generation()
+    for user_hash in ("a", "b", "c"):       # "a"'s stamp no longer fits
+        cache.invalidate(user_hash)
+    cache.put("a", "v1", "stale", generation)
+    assert cache.get("a", "v1") is None
+    cache.put("a", "v1", "fresh", cache.generation())
+    assert cache.get("a", "v1") == "fresh"
+
+
+def test_score_racing_a_log_action_is_not_cached(run_app, monkeypatch):
+    user_hash = "cache-race-user"
+    load_state = feature_state.load_state
+
+    async def scenario(client):
+        await client.post("/v1/log-action", json={"user_hash": user_hash, **PURCHASE})
+        state_read, release = asyncio.Event(), asyncio.Event()
+
+        async def load_state_then_wait(db, h):
+            state = await load_state(db, h)
+            state_read.set()
+            await release.wait()
+            return state
+
+        # Score reads the state, the return commits, then the score finishes
+        monkeypatch.setattr(feature_state, "load_state", load_state_then_wait)
+        racing = asyncio.create_task(client.post("/v1/get-risk-score", json={"user_hash": user_hash}))
+        await asyncio.wait_for(state_read.wait(), 10)
+        logged = await client.post("/v1/log-action", json={"user_hash": user_hash, **RETURN})
+        release.set()
+        stale = await asyncio.wait_for(racing, 10)
+        monkeypatch.setattr(feature_state, "load_state", load_state)
+
+        after = await client.post("/v1/get-risk-score", json={"user_hash": user_hash})
+        return logged, stale, after
+
+    logged, stale, after = run_app(scenario)
+    assert logged.json()["status"] == "recorded"
+    assert stale.json()["features_used"]["total_returns"] == 0.0
+    assert after.json()["features_used"]["total_returns"] == 1.0
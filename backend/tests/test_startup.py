@@ -0,0 +1,34 @@
+"""Startup trains a model only when none is on disk, never over a broken one."""
+from main import settings
+from services import background_training
+
+
+def _startup(run_app, monkeypatch, tmp_path, pickle_bytes=None):
+    model_path = tmp_path / "fraud_model.pkl"
+    features_path = tmp_path / "feature_names.json"
+    if pickle_bytes is not None:
+        model_path.write_bytes(pickle_bytes)
+        features_path.write_text('["return_to_purchase_ratio"]')
+    monkeypatch.setattr(settings, "model_path", str(model_path))
+    monkeypatch.setattr(settings, "feature_names_path", str(features_path))
+    monkeypatch.setattr(settings, "auto_train_on_startup", True)
+    started = []
+    monkeypatch.setattr(background_training, "start", lambda: started.append(True))
+
+    async def scenario(client):
+        return await client.get("/health", params={"require_model": "true"})
+    return run_app(scenario), started, model_path
+
+
+def test_missing_model_is_trained(run_app, monkeypatch, tmp_path):
+    response, started, _ = _startup(run_app, monkeypatch, tmp_path)
+    assert started == [True]
+    assert response.status_code == 503 and response.json()["model_error"] is None
+
+
+def test_corrupt_model_is_reported_not_retrained(run_app, monkeypatch, tmp_path):
+    response, started, model_path = _startup(run_app, monkeypatch, tmp_path, b"not a pickle")
+    assert started == []
+    assert response.status_code == 503
+    assert response.json()["status"] == "model_not_ready" and response.json()["model_error"]
+    assert model_path.read_bytes() == b"not a pickle"
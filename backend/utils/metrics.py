@@ -0,0 +1,235 @@
+"""
+Metrics — request and per-stage latency histograms, exposed for Prometheus.
+
+Latencies are recorded into HDR-style log-linear histograms: each power of
+two is split into SUB_BUCKETS linear buckets, so every recorded value lands
+within ~1/SUB_BUCKETS relative error from 10 µs up to minutes, at constant
+memory and O(1) cost per sample. Quantiles (p50/p90/p99/p99.9) are read
+straight off the buckets.
+
+  MetricsMiddleware     — times every HTTP request, keyed by route template
+  span("inference")     — times a stage inside a handler; feeds the stage
+                          histogram and the request's Server-Timing header
+  render_prometheus()   — text exposition format for GET /metrics
+"""
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+SUB_BUCKETS = 8                   # linear buckets per power of two (~9% resolution)
+MIN_SECONDS = 1e-5                # values below land in the first bucket
+MAX_EXPONENT = 24                 # 10 µs · 2^24 ≈ 168 s; larger values are clamped
+NUM_BUCKETS = MAX_EXPONENT * SUB_BUCKETS + 1
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class Histogram:
+    """Log-linear latency histogram (seconds)."""
+
+    def __init__(self):
+        self.counts = [0] * NUM_BUCKETS
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = Lock()
+
+    @staticmethod
+    def _index(seconds: float) -> int:
+        scaled = seconds / MIN_SECONDS
+        if scaled < 1.0:
+            return 0
+        mantissa, exponent = math.frexp(scaled)        # scaled = mantissa · 2^exponent, mantissa ∈ [0.5, 1)
+        index = (exponent - 1) * SUB_BUCKETS + int((mantissa * 2 - 1) * SUB_BUCKETS) + 1
+        return min(index, NUM_BUCKETS - 1)
+
+    @staticmethod
+    def upper_bound(index: int) -> float:
+        """Upper edge (seconds) of bucket `index`."""
+        if index == 0:
+            return MIN_SECONDS
+        exponent, sub = divmod(index - 1, SUB_BUCKETS)
+        return MIN_SECONDS * (2 ** exponent) * (1 + (sub + 1) / SUB_BUCKETS)
+
+    def record(self, seconds: float) -> None:
+        index = self._index(seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket edge below which a fraction q of samples fall (0 if empty)."""
+        with self._lock:
+            if not self.total:
+                return 0.0
+            rank = max(1, math.ceil(q * self.total))
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank:
+                    return min(self.upper_bound(index), self.max)
+        return self.max
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """(le, cumulative count) at every power-of-two edge, for Prometheus buckets."""
+        with self._lock:
+            out, seen = [], 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if index % SUB_BUCKETS == 0:
+                    out.append((self.upper_bound(index), seen))
+            return out
+
+
+# ── Registry ──────────────────────────────────────────────────────────────────
+_PREFIX = "returnguard"
+_request_hists: Dict[Tuple[str, str, str], Histogram] = {}
+_stage_hists: Dict[Tuple[str, str], Histogram] = {}
+_gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+_registry_lock = Lock()
+
+# Spans of the request being handled: [(stage, seconds), ...]
+_current: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("metrics_spans", default=None)
+
+
+def _get(table: Dict, key: Tuple) -> Histogram:
+    hist = table.get(key)
+    if hist is None:
+        with _registry_lock:
+            hist = table.setdefault(key, Histogram())
+    return hist
+
+
+def observe_request(route: str, method: str, status: int, seconds: float) -> None:
+    _get(_request_hists, (route, method, str(status))).record(seconds)
+
+
+def observe_stage(route: str, stage: str, seconds: float) -> None:
+    _get(_stage_hists, (route, stage)).record(seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Time a block as `stage` of the current request. The span is recorded
+    against the route once the request completes; outside a request
+    (scripts, background writers) this is a no-op.
+    """
+    spans = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if spans is not None:
+            spans.append((stage, time.perf_counter() - start))
+
+
+def register_gauge(name: str, help_text: str, read: Callable[[], float]) -> None:
+    """Expose a point-in-time value (queue depth, cache size, ...) on /metrics."""
+    _gauges[name] = (help_text, read)
+
+
+def reset() -> None:
+    with _registry_lock:
+        _request_hists.clear()
+        _stage_hists.clear()
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+def _render_histogram(lines: List[str], name: str, labels: Dict[str, str], hist: Histogram) -> None:
+    for le, count in hist.cumulative():
+        lines.append(f"{name}_bucket{_labels(**labels, le=f'{le:.6g}')} {count}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {hist.total}")
+    lines.append(f"{name}_sum{_labels(**labels)} {hist.sum:.9f}")
+    lines.append(f"{name}_count{_labels(**labels)} {hist.total}")
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines: List[str] = []
+
+    name = f"{_PREFIX}_http_request_duration_seconds"
+    lines += [f"# HELP {name} HTTP request latency by route template.", f"# TYPE {name} histogram"]
+    for (route, method, status), hist in sorted(_request_hists.items()):
+        _render_histogram(lines, name, {"route": route, "method": method, "status": status}, hist)
+
+    name = f"{_PREFIX}_stage_duration_seconds"
+    lines += [f"# HELP {name} Time spent in each stage of a request.", f"# TYPE {name} histogram"]
+    for (route, stage), hist in sorted(_stage_hists.items()):
+        _render_histogram(lines, name, {"route": route, "stage": stage}, hist)
+
+    # Quantiles straight from the HDR buckets, for dashboards without histogram_quantile()
+    name = f"{_PREFIX}_http_request_duration_quantile_seconds"
+    lines += [f"# HELP {name} Request latency quantiles (bucket upper edge).", f"# TYPE {name} gauge"]
+    for (route, method, status), hist in sorted(_request_hists.items()):
+        for q in QUANTILES:
+            labels = _labels(route=route, method=method, status=status, quantile=str(q))
+            lines.append(f"{name}{labels} {hist.quantile(q):.9f}")
+
+    name = f"{_PREFIX}_stage_duration_quantile_seconds"
+    lines += [f"# HELP {name} Stage latency quantiles (bucket upper edge).", f"# TYPE {name} gauge"]
+    for (route, stage), hist in sorted(_stage_hists.items()):
+        for q in QUANTILES:
+            labels = _labels(route=route, stage=stage, quantile=str(q))
+            lines.append(f"{name}{labels} {hist.quantile(q):.9f}")
+
+    for gauge, (help_text, read) in sorted(_gauges.items()):
+        full = f"{_PREFIX}_{gauge}"
+        lines += [f"# HELP {full} {help_text}", f"# TYPE {full} gauge", f"{full} {float(read())}"]
+    return "\n".join(lines) + "\n"
+
+
+# ── Middleware ────────────────────────────────────────────────────────────────
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request. Requests are labelled with
+    the matched route template (e.g. /v1/history/{user_hash}) to keep label
+    cardinality bounded. With server_timing=True each response carries a
+    Server-Timing header listing the request's spans and total time.
+    """
+
+    def __init__(self, app, server_timing: bool = False, exclude: Tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.server_timing = server_timing
+        self.exclude = exclude
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        spans: List[Tuple[str, float]] = []
+        token = _current.set(spans)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    timings = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in spans]
+                    timings.append(f"app;dur={(time.perf_counter() - start) * 1000:.2f}")
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", ", ".join(timings).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            # Starlette records the matched route in the scope during routing
+            route = getattr(scope.get("route"), "path", "unmatched")
+            observe_request(route, scope["method"], status, elapsed)
+            for stage, seconds in spans:
+                observe_stage(route, stage, seconds)
@@ -0,0 +1,266 @@
+"""
+loadtest.py — reproducible load test for the scoring API
+
+Seeds a SQLite database with synthetic users (ml/generate_data.py), then
+drives /v1/log-action and /v1/get-risk-score with concurrent async httpx
+clients and prints throughput and latency percentiles as JSON, so runs
+before and after a change can be diffed or tracked over time.
+
+Targets:
+  asgi     — the app in-process via httpx.ASGITransport (no network, no
+             server; isolates application cost)
+  uvicorn  — a uvicorn server started on the seeded database (--workers)
+  --url    — an already running server (seeding is skipped)
+
+Usage:
+    python bench/loadtest.py
+    python bench/loadtest.py --target uvicorn --workers 2 --concurrency 64 --duration 20
+    python bench/loadtest.py --users 5000 --depth 3 --mix 0.2 --out before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT / "backend"
+ML_DIR = ROOT / "ml"
+
+ACTION_TYPES = ["View", "AddToCart", "Purchase", "ReturnRequest"]
+CATEGORIES = ["Clothing", "Electronics", "Footwear", "Accessories", "Books", "Sports"]
+SEED_CHUNK = 2000
+
+
+# ── Seeding ───────────────────────────────────────────────────────────────────
+def _generate(users: int, fraud_rate: float, depth: float, seed: int) -> List[Dict[str, Any]]:
+    sys.path.insert(0, str(ML_DIR))
+    from generate_data import generate_transactions
+
+    df = generate_transactions(users, fraud_rate=fraud_rate, depth=depth, seed=seed)
+    df = df.drop(columns=["is_fraud"]).sort_values("timestamp", kind="stable")
+    df["order_id"] = "ORD_" + df["order_id"].astype(str)
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict("records")
+
+
+async def _seed(events: List[Dict[str, Any]]) -> None:
+    from db import AsyncSessionLocal, engine, init_db
+    from services import action_log
+
+    await init_db()
+    for start in range(0, len(events), SEED_CHUNK):
+        async with AsyncSessionLocal() as db:
+            await action_log.record_actions(db, events[start:start + SEED_CHUNK])
+            await db.commit()
+    await engine.dispose()
+
+
+# ── Workload ──────────────────────────────────────────────────────────────────
+def _action_payload(rng: random.Random, user_hash: str) -> Dict[str, Any]:
+    return {
+        "user_hash": user_hash,
+        "action_type": rng.choice(ACTION_TYPES),
+        "product_id": f"PROD_{rng.randint(100, 999)}",
+        "product_category": rng.choice(CATEGORIES),
+        "order_value": round(rng.uniform(199, 8000), 2),
+    }
+
+
+async def _client(client, rng: random.Random, users: List[str], mix: float, deadline: float,
+                  warmup_until: float, samples: Dict[str, List[float]], errors: Dict[str, int]) -> None:
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            return
+        user_hash = rng.choice(users)
+        if rng.random() < mix:
+            endpoint, body = "/v1/log-action", _action_payload(rng, user_hash)
+        else:
+            endpoint, body = "/v1/get-risk-score", {"user_hash": user_hash}
+        start = time.perf_counter()
+        try:
+            response = await client.post(endpoint, json=body)
+            status = str(response.status_code)
+        except Exception as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        if start < warmup_until:
+            continue
+        if status == "200":
+            samples[endpoint].append(elapsed)
+        else:
+            errors[f"{endpoint} {status}"] = errors.get(f"{endpoint} {status}", 0) + 1
+
+
+async def _drive(client, users: List[str], args) -> Dict[str, Any]:
+    samples: Dict[str, List[float]] = {"/v1/log-action": [], "/v1/get-risk-score": []}
+    errors: Dict[str, int] = {}
+    started = time.perf_counter()
+    warmup_until = started + args.warmup
+    deadline = warmup_until + args.duration
+    await asyncio.gather(*[
+        _client(client, random.Random(args.seed + i), users, args.mix, deadline, warmup_until, samples, errors)
+        for i in range(args.concurrency)
+    ])
+    measured = time.perf_counter() - warmup_until
+    return _report(samples, errors, measured)
+
+
+def _summary(latencies: List[float], seconds: float) -> Dict[str, Any]:
+    if not latencies:
+        return {"requests": 0}
+    ms = np.asarray(latencies) * 1000
+    p50, p90, p99, p999 = np.percentile(ms, [50, 90, 99, 99.9])
+    return {
+        "requests": len(ms),
+        "rps": round(len(ms) / seconds, 1),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p90_ms": round(float(p90), 3),
+        "p99_ms": round(float(p99), 3),
+        "p999_ms": round(float(p999), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def _report(samples: Dict[str, List[float]], errors: Dict[str, int], seconds: float) -> Dict[str, Any]:
+    every = [s for latencies in samples.values() for s in latencies]
+    return {
+        "duration_s": round(seconds, 3),
+        "total": _summary(every, seconds),
+        "endpoints": {endpoint: _summary(latencies, seconds) for endpoint, latencies in samples.items()},
+        "errors": errors,
+    }
+
+
+# ── Targets ───────────────────────────────────────────────────────────────────
+async def _run_asgi(users: List[str], args) -> Dict[str, Any]:
+    import httpx
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=30) as client:
+            return await _drive(client, users, args)
+
+
+async def _run_http(users: List[str], url: str, args) -> Dict[str, Any]:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        return await _drive(client, users, args)
+
+
+def _start_uvicorn(args, env: Dict[str, str]) -> subprocess.Popen:
+    import httpx
+
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+           "--workers", str(args.workers), "--log-level", "warning"]
+    server = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"❌ uvicorn exited with {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{args.port}/health", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    sys.exit("❌ uvicorn did not become healthy within 60 s")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test /v1/log-action and /v1/get-risk-score")
+    parser.add_argument("--target", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--url", help="Benchmark an already running server instead (no seeding)")
+    parser.add_argument("--db", default="/tmp/returnguard_loadtest.db", help="SQLite file to seed")
+    parser.add_argument("--users", type=int, default=1000, help="Synthetic users to seed")
+    parser.add_argument("--fraud-rate", type=float, default=0.02)
+    parser.add_argument("--depth", type=float, default=1.0, help="History length multiplier per user")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds excluded from results")
+    parser.add_argument("--mix", type=float, default=0.3, help="Fraction of requests that are log-action")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (--target uvicorn)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    args.db = os.path.abspath(args.db)
+    args.out = args.out and os.path.abspath(args.out)
+
+    # The app reads its settings at import time; point it at the bench DB first
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{args.db}"
+    os.environ.setdefault("APP_ENV", "production")
+    os.environ.setdefault("AUTO_TRAIN_ON_STARTUP", "false")
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.chdir(BACKEND_DIR)
+
+    events = _generate(args.users, args.fraud_rate, args.depth, args.seed)
+    users = list(dict.fromkeys(e["user_hash"] for e in events))
+    seed_s = None
+    if not args.url:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+        started = time.perf_counter()
+        asyncio.run(_seed(events))
+        seed_s = round(time.perf_counter() - started, 3)
+        print(f"🌱 Seeded {len(users)} users / {len(events)} events in {seed_s} s", file=sys.stderr)
+
+    if args.url:
+        target = args.url
+        result = asyncio.run(_run_http(users, args.url, args))
+    elif args.target == "uvicorn":
+        target = f"uvicorn x{args.workers}"
+        server = _start_uvicorn(args, dict(os.environ))
+        try:
+            result = asyncio.run(_run_http(users, f"http://127.0.0.1:{args.port}", args))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    else:
+        target = "asgi"
+        result = asyncio.run(_run_asgi(users, args))
+
+    report = {
+        "benchmark": "loadtest",
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "target": target,
+        "params": {k: getattr(args, k) for k in
+                   ("users", "fraud_rate", "depth", "concurrency", "duration", "warmup", "mix", "workers", "seed")},
+        "seed": {"users": len(users), "events": len(events), "seconds": seed_s},
+        **result,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+microbench.py — microbenchmarks for the per-score CPU hot path
+
+Times feature assembly (features/engineer.py) and model_service.predict()
+in isolation, pytest-benchmark style: each case is auto-ranged to a
+number of calls per round, run for --rounds rounds, and reported as
+min / median / mean / stddev per call.
+
+Cases:
+  assemble_features[N]    — full history replay, N = 10, 200, 10000 rows
+  update_feature_state[N] — incremental fold of N rows into an aggregate
+  features_from_state     — feature vector from a folded aggregate
+  get_reason_codes        — reason codes for one feature vector
+  predict[model]          — one row through the trained model on disk
+  predict[heuristic]      — one row through the rule-based fallback
+
+Baselines are stored per case in bench/baselines/microbench.json
+(--save). Rounds are timed in process CPU time, each paired with a
+round of a fixed pure-Python calibration loop, and each case keeps the
+median per-round ratio ("relative"), so neither other load nor the
+machine's speed shifts it. --compare re-runs the cases and exits 1 if
+any relative median is more than --threshold slower than its baseline.
+It warns when the recording machine differs, since interpreter and CPU
+changes don't scale every case alike — re-record with --save there for
+tight thresholds.
+
+Usage:
+    python bench/microbench.py
+    python bench/microbench.py --save
+    python bench/microbench.py --compare --threshold 0.25
+    python bench/microbench.py -k predict --json
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT / "backend"
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "microbench.json"
+
+HISTORY_SIZES = (10, 200, 10_000)
+CATEGORIES = ["Clothing", "Electronics", "Footwear", "Accessories", "Books", "Sports"]
+SIZES = ["XS", "S", "M", "L", "XL", "XXL"]
+MIN_ROUND_SECONDS = 0.01
+# Repeated runs of an unchanged tree stay within ~15% of each other per case
+DEFAULT_THRESHOLD = 0.25
+# CPU time of this process: time spent descheduled by other load doesn't count
+TIMER = time.process_time
+
+
+def synthetic_history(rows: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """A mixed purchase/return history shaped like /v1/history rows (ISO dates)."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    history = []
+    for i in range(rows):
+        delivered = start + timedelta(days=rng.randint(0, 365))
+        returned = rng.random() < 0.3
+        history.append({
+            "action_type": "ReturnRequest" if returned else "Purchase",
+            "order_value": round(rng.uniform(199, 8000), 2),
+            "product_category": rng.choice(CATEGORIES),
+            "product_id": f"PROD_{rng.randint(100, 140)}",
+            "size_variant": rng.choice(SIZES),
+            "delivery_date": delivered.isoformat(),
+            "return_date": (delivered + timedelta(days=rng.randint(1, 21))).isoformat() if returned else None,
+        })
+    return history
+
+
+def calibration_loop() -> int:
+    """Fixed interpreter-bound work (dict/set/arithmetic) that scales with CPU speed."""
+    counts: Dict[int, int] = {}
+    seen = set()
+    total = 0
+    for i in range(2_000):
+        key = i % 97
+        counts[key] = counts.get(key, 0) + 1
+        seen.add(i % 13)
+        total += i * key // 7
+    return total + len(seen)
+
+
+def machine() -> Dict[str, str]:
+    """What the timings depend on beyond the code under test."""
+    import numpy
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(), "numpy": numpy.__version__}
+
+
+def _cases() -> List[Tuple[str, Callable[[], Any]]]:
+    from features.engineer import (
+        assemble_features, features_from_state, get_reason_codes, new_feature_state, update_feature_state,
+    )
+    from services import model_service
+    from config import get_settings
+
+    cases: List[Tuple[str, Callable[[], Any]]] = []
+    for rows in HISTORY_SIZES:
+        history = synthetic_history(rows)
+        cases.append((f"assemble_features[{rows}]", lambda h=history: assemble_features(h)))
+
+    for rows in HISTORY_SIZES:
+        history = synthetic_history(rows)
+
+        def fold(h=history):
+            state = new_feature_state()
+            for txn in h:
+                update_feature_state(state, txn)
+            return state
+        cases.append((f"update_feature_state[{rows}]", fold))
+
+    state = new_feature_state()
+    for txn in synthetic_history(200):
+        update_feature_state(state, txn)
+    features = features_from_state(state)
+    cases.append(("features_from_state", lambda: features_from_state(state)))
+    cases.append(("get_reason_codes", lambda: get_reason_codes(features)))
+
+    # Model path: whatever startup would load (flat forest or pickle); the
+    # heuristic case then reloads with no artifacts, as on a fresh deploy
+    settings = get_settings()
+    model_service.load_model(settings.model_path, settings.feature_names_path, settings.flat_model_path)
+    if model_service.is_loaded():
+        cases.append(("predict[model]", lambda: model_service.predict(features)))
+    else:
+        print("⚠️  No trained model on disk — skipping predict[model]", file=sys.stderr)
+
+    def heuristic():
+        if model_service.is_loaded():
+            model_service.load_model("", "")
+        return model_service.predict(features)
+    cases.append(("predict[heuristic]", heuristic))
+    return cases
+
+
+def _autorange(fn: Callable[[], Any]) -> int:
+    """Calls per round so that one round takes at least MIN_ROUND_SECONDS."""
+    loops = 1
+    while True:
+        start = TIMER()
+        for _ in range(loops):
+            fn()
+        if TIMER() - start >= MIN_ROUND_SECONDS:
+            return loops
+        loops *= 2
+
+
+def _time_round(fn: Callable[[], Any], loops: int) -> float:
+    """Microseconds per call over one round of `loops` calls."""
+    start = TIMER()
+    for _ in range(loops):
+        fn()
+    return (TIMER() - start) / loops * 1e6
+
+
+def measure(fn: Callable[[], Any], rounds: int) -> Dict[str, float]:
+    """
+    Per-call statistics in microseconds over `rounds` auto-ranged rounds.
+    Each round is paired with a round of calibration_loop() timed right
+    before it; "relative" is the median of the per-round ratios, so
+    frequency scaling or load that drifts during the run cancels out.
+    The cyclic GC is off while timing, as in timeit: its pauses depend on
+    everything else the process holds, not on the code under test.
+    """
+    fn()  # warm caches and lazy imports
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        loops = _autorange(fn)
+        calibration_loops = _autorange(calibration_loop)
+        per_call, ratios = [], []
+        for _ in range(rounds):
+            unit = _time_round(calibration_loop, calibration_loops)
+            per_call.append(_time_round(fn, loops))
+            ratios.append(per_call[-1] / unit)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {
+        "min_us": round(min(per_call), 3),
+        "median_us": round(statistics.median(per_call), 3),
+        "mean_us": round(statistics.fmean(per_call), 3),
+        "stddev_us": round(statistics.stdev(per_call), 3) if rounds > 1 else 0.0,
+        "ops_per_s": round(1e6 / statistics.median(per_call), 1),
+        "relative": float(f"{statistics.median(ratios):.6g}"),
+        "rounds": rounds,
+        "loops": loops,
+    }
+
+
+def run_cases(select: Optional[str] = None, rounds: int = 20, verbose: bool = False) -> Dict[str, Dict[str, float]]:
+    """measure() every case whose name contains `select` (all if None)."""
+    results: Dict[str, Dict[str, float]] = {}
+    for name, fn in _cases():
+        if select and select not in name:
+            continue
+        results[name] = s = measure(fn, rounds)
+        if verbose:
+            print(f"⏱️  {name:<30} median {s['median_us']:>10.3f} µs  min {s['min_us']:>10.3f}  "
+                  f"± {s['stddev_us']:.3f}  ({s['ops_per_s']:,.0f} ops/s, {s['relative']:.4g}x)")
+    return results
+
+
+def _score(stats: Dict[str, float]) -> Tuple[float, str]:
+    """The value compared across runs: relative median if recorded, else absolute µs."""
+    if "relative" in stats:
+        return stats["relative"], "x"
+    return stats["median_us"], "µs"
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> List[str]:
+    """
+    Names of cases whose median regressed by more than `threshold` (0.25 = 25%),
+    compared as multiples of the calibration loop so CPU speed cancels out.
+    """
+    print(f"\n{'case':<30} {'baseline':>14} {'now':>14} {'change':>9}")
+    regressions = []
+    for name, stats in results.items():
+        now, unit = _score(stats)
+        if name not in baseline:
+            print(f"{name:<30} {'—':>14} {now:>12.6g}{unit:>2} {'new':>9}")
+            continue
+        before, before_unit = _score(baseline[name])
+        if before_unit != unit:
+            now, unit = stats["median_us"], "µs"
+            before = baseline[name]["median_us"]
+        change = now / before - 1.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  ❌"
+        print(f"{name:<30} {before:>12.6g}{unit:>2} {now:>12.6g}{unit:>2} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmark feature assembly and model scoring")
+    parser.add_argument("-k", dest="select", help="Only run cases whose name contains this string")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="Fail if slower than the stored baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative median slowdown (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    args.baseline = os.path.abspath(args.baseline)
+
+    os.environ.setdefault("APP_ENV", "production")
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.chdir(BACKEND_DIR)
+    logging.disable(logging.WARNING)
+
+    results = run_cases(args.select, args.rounds, verbose=not args.json)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    status = 0
+    if args.compare:
+        baseline_path = Path(args.baseline)
+        if not baseline_path.exists():
+            sys.exit(f"❌ No baseline at {baseline_path}; run with --save first")
+        stored = json.loads(baseline_path.read_text())
+        baseline = stored["cases"]
+        if stored.get("machine") != machine():
+            print(f"⚠️  Baseline recorded on {stored.get('machine')}; this is {machine()}. Comparing "
+                  f"calibration-relative medians — re-record with --save here for tight thresholds",
+                  file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} case(s) slower than baseline by > {args.threshold:.0%}: "
+                  f"{', '.join(regressions)}")
+            status = 1
+        else:
+            print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+
+    if args.save:
+        baseline_path = Path(args.baseline)
+        stored = json.loads(baseline_path.read_text())["cases"] if baseline_path.exists() else {}
+        stored.update(results)
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps({
+            "machine": machine(),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "cases": stored,
+        }, indent=2) + "\n")
+        print(f"💾 Baseline saved → {baseline_path}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
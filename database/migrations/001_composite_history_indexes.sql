@@ -0,0 +1,25 @@
+-- ReturnGuard AI — Migration 001: composite history indexes
+--
+-- Replaces the single-column user_hash indexes on transactions and
+-- risk_scores with (user_hash, <time> DESC) indexes, so the per-user
+-- "latest N" reads are served in index order without a sort.
+--
+-- PostgreSQL: CONCURRENTLY builds without blocking writes. Run each
+-- statement outside a transaction block (e.g. psql without -1):
+--     psql "$DATABASE_URL" -f database/migrations/001_composite_history_indexes.sql
+-- If a concurrent build fails it leaves an INVALID index; drop it and re-run.
+--
+-- SQLite: the backend creates the missing indexes and drops the replaced
+-- ones on startup (db.init_db), so no manual step is needed. To apply by hand, drop the CONCURRENTLY keywords.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_transactions_user_hash_timestamp
+    ON transactions (user_hash, timestamp DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_risk_scores_user_hash_computed_at
+    ON risk_scores (user_hash, computed_at DESC);
+
+-- The composite indexes cover user_hash-only lookups via their prefix
+DROP INDEX CONCURRENTLY IF EXISTS idx_transactions_user_hash;
+DROP INDEX CONCURRENTLY IF EXISTS ix_transactions_user_hash;
+DROP INDEX CONCURRENTLY IF EXISTS idx_risk_scores_user_hash;
+DROP INDEX CONCURRENTLY IF EXISTS ix_risk_scores_user_hash;
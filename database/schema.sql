@@ -30,7 +30,8 @@ CREATE TABLE IF NOT EXISTS transactions (
     order_id            VARCHAR(64)            -- Groups Purchase + ReturnRequest for same order
 );
 
-CREATE INDEX IF NOT EXISTS idx_transactions_user_hash ON transactions(user_hash);
+-- Per-user history, newest first; also covers plain user_hash lookups
+CREATE INDEX IF NOT EXISTS idx_transactions_user_hash_timestamp ON transactions(user_hash, timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_transactions_action_type ON transactions(action_type);
 CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions(timestamp);
 
@@ -48,4 +49,22 @@ CREATE TABLE IF NOT EXISTS risk_scores (
     model_version   VARCHAR(20) DEFAULT 'v1.0'
 );
 
-CREATE INDEX IF NOT EXISTS idx_risk_scores_user_hash ON risk_scores(user_hash);
+CREATE INDEX IF NOT EXISTS idx_risk_scores_user_hash_computed_at ON risk_scores(user_hash, computed_at DESC);
+
+-- =========================================
+-- USER FEATURE STATE TABLE
+-- Running per-user aggregates, updated on every logged action
+-- so scoring reads one row instead of replaying history
+-- =========================================
+CREATE TABLE IF NOT EXISTS user_feature_state (
+    user_hash           VARCHAR(64) PRIMARY KEY REFERENCES users(user_hash) ON DELETE CASCADE,
+    purchase_count      INTEGER NOT NULL DEFAULT 0,
+    return_count        INTEGER NOT NULL DEFAULT 0,
+    gap_days_sum        INTEGER NOT NULL DEFAULT 0,   -- Sum of delivery→return gaps (days)
+    gap_count           INTEGER NOT NULL DEFAULT 0,
+    order_value_sum     DOUBLE PRECISION NOT NULL DEFAULT 0,
+    order_value_count   INTEGER NOT NULL DEFAULT 0,
+    categories          TEXT,                         -- JSON array of purchased categories
+    product_sizes       TEXT,                         -- JSON object: product_id -> [sizes]
+    updated_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
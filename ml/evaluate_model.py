@@ -3,8 +3,10 @@ Model Evaluation Script
 ========================
 Loads the saved model and generates a detailed evaluation report.
 Run this after train_model.py to verify model quality.
+Pass --format parquet/arrow to read data/features.* in that format.
 """
 import json
+import argparse
 import joblib
 import numpy as np
 import pandas as pd
@@ -16,12 +18,18 @@ import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 
+from pipeline_io import FORMATS, data_path, read_table
+
+parser = argparse.ArgumentParser(description="Evaluate the trained fraud model")
+parser.add_argument("--format", choices=sorted(FORMATS), default="csv", help="Format of data/features.*")
+args = parser.parse_args()
+
 print("Loading model and data...")
 model = joblib.load("models/fraud_model.pkl")
 with open("models/feature_names.json") as f:
     feature_cols = json.load(f)
 
-df = pd.read_csv("data/features.csv")
+df = read_table(data_path("features", args.format), columns=feature_cols + ["is_fraud"])
 X = df[feature_cols].values
 y = df["is_fraud"].values
 
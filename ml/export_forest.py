@@ -0,0 +1,47 @@
+"""
+Flat Forest Export
+===================
+Flattens the trained RandomForest (models/fraud_model.pkl) into the
+contiguous NumPy arrays scored by backend/services/flat_forest.py,
+after verifying it reproduces predict_proba on the feature matrix.
+Run this after train_model.py / run_all.py.
+Output: models/fraud_model.flat
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "backend")
+sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+
+from services.flat_forest import FlatForest, check_parity  # noqa: E402
+
+
+def export_forest(model, X, out_path: str = "models/fraud_model.flat") -> FlatForest:
+    """Flatten `model`, check parity on X, and write the arrays to out_path."""
+    flat = FlatForest.from_sklearn(model)
+    diff = check_parity(model, flat, X)
+    flat.save(out_path)
+    print(f"✅ Flat forest saved to {out_path} "
+          f"({flat.n_trees} trees, {flat.n_nodes} nodes, max parity diff {diff:.2e})")
+    return flat
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import joblib
+    from pipeline_io import FORMATS, data_path, read_table
+
+    parser = argparse.ArgumentParser(description="Export the RandomForest as flat arrays")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv", help="Format of data/features.*")
+    args = parser.parse_args()
+
+    model = joblib.load("models/fraud_model.pkl")
+    if not hasattr(model, "estimators_"):
+        print(f"⚠️  {type(model).__name__} is not a tree forest — nothing to export.")
+        sys.exit(0)
+
+    with open("models/feature_names.json") as f:
+        feature_cols = json.load(f)
+    X = read_table(data_path("features", args.format), columns=feature_cols).values
+    export_forest(model, X)
@@ -3,73 +3,250 @@ Feature Engineering Script
 ============================
 Transforms raw transaction records → per-user feature vectors.
 Matches the features produced by backend/features/engineer.py
-Output: data/features.csv
+Output: data/features.csv (or .parquet / .arrow via --format)
+
+engineer_features() is vectorized with groupby aggregations (one pass
+per feature over the whole frame) and is shared by run_all.py and
+backend/startup_train.py. Pass --chunksize to stream transaction files
+larger than RAM through engineer_features_chunked().
 """
+import argparse
+from typing import Iterable
+
 import pandas as pd
 import numpy as np
-from collections import defaultdict
-import os
 
-print("Loading synthetic transactions...")
-df = pd.read_csv("data/synthetic_transactions.csv", parse_dates=["timestamp", "delivery_date", "return_date"])
+from pipeline_io import FORMATS, data_path, iter_table, read_table, write_table
+
+FEATURE_COLS = [
+    "return_to_purchase_ratio",
+    "temporal_gap_days",
+    "size_variation_flag",
+    "category_diversity",
+    "avg_order_value",
+    "total_purchases",
+    "total_returns",
+]
+
+
+def _round(series: pd.Series, ndigits: int) -> pd.Series:
+    """
+    Vectorized Python round(): half to even on the exact binary value, as
+    the per-user reference rounds. np.round scales by 10**ndigits first and
+    that product's own rounding can cross a half (4728.19499… → 4728.2), so
+    the product's exact error (Dekker's two-product) settles those ties.
+    """
+    def split(a):
+        c = 134217729.0 * a                  # 2**27 + 1
+        hi = c - (c - a)
+        return hi, a - hi
+
+    x = series.to_numpy(dtype=float)
+    scale = 10.0 ** ndigits
+    scaled = x * scale
+    (x_hi, x_lo), (s_hi, s_lo) = split(x), split(scale)
+    error = ((x_hi * s_hi - scaled) + x_hi * s_lo + x_lo * s_hi) + x_lo * s_lo
+    rounded = np.rint(scaled)
+    half = scaled - rounded
+    rounded += ((half == 0.5) & (error > 0)).astype(float) - ((half == -0.5) & (error < 0))
+    return pd.Series(rounded / scale, index=series.index)
+
+
+def _segment_sums(df: pd.DataFrame, column: str, users: pd.Index):
+    """
+    Per-user sum and non-null count of `column`, summed exactly as
+    Series.mean() does (numpy pairwise summation with NaN counted as 0).
+    groupby().sum() uses Kahan summation, which can flip the last rounded
+    decimal of an average.
+    """
+    codes = pd.Categorical(df["user_hash"], categories=users).codes
+    order = np.argsort(codes, kind="stable")
+    values = df[column].to_numpy(dtype=float)[order]
+    missing = np.isnan(values)
+    filled = np.where(missing, 0.0, values)
+
+    # Users with n rows form an (users, n) matrix: a row-wise sum is the same
+    # pairwise summation, so the loop is over distinct row counts, not users
+    rows_per_user = np.bincount(codes, minlength=len(users))
+    starts = np.cumsum(rows_per_user) - rows_per_user
+    sums = np.zeros(len(users))
+    for n in np.unique(rows_per_user[rows_per_user > 0]):
+        members = np.flatnonzero(rows_per_user == n)
+        sums[members] = filled[starts[members][:, None] + np.arange(n)].sum(axis=1)
+    counts = np.bincount(codes[order], weights=~missing, minlength=len(users)).astype(int)
+    return sums, counts
+
+
+def _partial_aggregates(df: pd.DataFrame):
+    """
+    Mergeable per-user aggregates for one slice of the transactions:
+    a frame of counts/sums indexed by user_hash (plus the global row of each
+    user's first appearance), and the distinct purchase (user, category) and
+    (user, product, size) combinations.
+    """
+    users = pd.Index(pd.unique(df["user_hash"]), name="user_hash")
+    purchases = df[df["action_type"] == "Purchase"]
+    returns = df[df["action_type"] == "ReturnRequest"]
+
+    agg = pd.DataFrame(index=users)
+    agg["first_row"] = df.index[~df["user_hash"].duplicated().to_numpy()]
+    agg["n_purchases"] = purchases.groupby("user_hash", observed=True).size().reindex(users, fill_value=0)
+    agg["n_returns"] = returns.groupby("user_hash", observed=True).size().reindex(users, fill_value=0)
+
+    ret_with_dates = returns.dropna(subset=["delivery_date", "return_date"])
+    # to_datetime: a chunk whose date columns are all empty is not parsed as datetime
+    gap_days = (
+        pd.to_datetime(ret_with_dates["return_date"]) - pd.to_datetime(ret_with_dates["delivery_date"])
+    ).dt.days.clip(lower=0)
+    gaps = gap_days.groupby(ret_with_dates["user_hash"], observed=True).agg(["sum", "count"])
+    agg["gap_sum"] = gaps["sum"].reindex(users, fill_value=0)
+    agg["gap_count"] = gaps["count"].reindex(users, fill_value=0)
+
+    agg["value_sum"], agg["value_count"] = _segment_sums(purchases, "order_value", users)
 
-print(f"Loaded {len(df)} rows, {df['user_hash'].nunique()} unique users")
+    if "is_fraud" in df.columns:
+        votes = df.groupby("user_hash", observed=True)["is_fraud"].agg(["sum", "count"]).reindex(users)
+        agg["fraud_votes"], agg["labelled_rows"] = votes["sum"], votes["count"]
 
-users = df["user_hash"].unique()
-feature_rows = []
+    categories = purchases[["user_hash", "product_category"]].dropna().drop_duplicates()
+    sizes = purchases[["user_hash", "product_id", "size_variant"]].dropna().drop_duplicates()
+    return agg, categories, sizes
 
-for user_hash in users:
-    utx = df[df["user_hash"] == user_hash]
-    purchases = utx[utx["action_type"] == "Purchase"]
-    returns = utx[utx["action_type"] == "ReturnRequest"]
+
+def _merge_partials(parts):
+    """Combine partial aggregates of disjoint row slices into one."""
+    aggs, categories, sizes = zip(*parts)
+    agg = pd.concat(aggs)
+    how = {col: ("min" if col == "first_row" else "sum") for col in agg.columns}
+    agg = agg.groupby(level="user_hash", sort=False, observed=True).agg(how)
+    return (
+        agg,
+        pd.concat(categories, ignore_index=True).drop_duplicates(),
+        pd.concat(sizes, ignore_index=True).drop_duplicates(),
+    )
+
+
+def _finalize(agg: pd.DataFrame, categories: pd.DataFrame, sizes: pd.DataFrame) -> pd.DataFrame:
+    """Turn merged aggregates into the feature matrix, in first-appearance order."""
+    agg = agg.sort_values("first_row")
+    users = agg.index
+    n_purchases = agg["n_purchases"]
+    n_returns = agg["n_returns"]
 
     # 1. Return-to-Purchase Ratio
-    n_purchases = len(purchases)
-    n_returns = len(returns)
-    rpr = n_returns / n_purchases if n_purchases > 0 else 0.0
+    rpr = _round(n_returns / n_purchases.where(n_purchases > 0), 4).fillna(0.0)
 
     # 2. Temporal Gap (avg days between delivery and return)
-    gaps = []
-    ret_with_dates = returns.dropna(subset=["delivery_date", "return_date"])
-    for _, row in ret_with_dates.iterrows():
-        gap = max(0, (row["return_date"] - row["delivery_date"]).days)
-        gaps.append(gap)
-    avg_gap = np.mean(gaps) if gaps else 30.0
+    avg_gap = _round(agg["gap_sum"] / agg["gap_count"].where(agg["gap_count"] > 0), 2).fillna(30.0)
 
     # 3. Size Variation Flag (same product, 3+ sizes → wardrobing)
-    purch_with_size = purchases.dropna(subset=["product_id", "size_variant"])
-    product_sizes = defaultdict(set)
-    for _, row in purch_with_size.iterrows():
-        product_sizes[row["product_id"]].add(row["size_variant"])
-    size_flag = int(any(len(s) >= 3 for s in product_sizes.values()))
+    sizes_per_product = sizes.groupby(["user_hash", "product_id"], observed=True).size()
+    size_flag = (
+        (sizes_per_product >= 3).groupby(level="user_hash", observed=True).any()
+        .reindex(users, fill_value=False).astype(float)
+    )
 
     # 4. Category Diversity
-    cats = purchases["product_category"].dropna().nunique()
-    cat_diversity = round(cats / n_purchases, 4) if n_purchases > 0 else 0.0
+    cats = categories.groupby("user_hash", observed=True).size().reindex(users, fill_value=0)
+    cat_diversity = _round(cats / n_purchases.where(n_purchases > 0), 4).fillna(0.0)
 
-    # 5. Avg Order Value
-    avg_value = float(purchases["order_value"].mean()) if n_purchases > 0 else 0.0
+    # 5. Avg Order Value (users without purchases → 0.0)
+    avg_value = agg["value_sum"] / agg["value_count"].where(agg["value_count"] > 0)
+    avg_value = _round(avg_value, 2).where(n_purchases > 0, 0.0)
 
-    # Label — majority vote from transaction labels
-    is_fraud = int(utx["is_fraud"].mode()[0]) if "is_fraud" in utx.columns else 0
+    # Label — majority vote from transaction labels (ties → 0, as Series.mode()[0])
+    if "fraud_votes" in agg.columns:
+        is_fraud = (agg["fraud_votes"] * 2 > agg["labelled_rows"]).astype(int)
+    else:
+        is_fraud = pd.Series(0, index=users)
 
-    feature_rows.append({
-        "user_hash": user_hash,
-        "return_to_purchase_ratio": round(rpr, 4),
-        "temporal_gap_days": round(avg_gap, 2),
-        "size_variation_flag": float(size_flag),
+    return pd.DataFrame({
+        "return_to_purchase_ratio": rpr,
+        "temporal_gap_days": avg_gap,
+        "size_variation_flag": size_flag,
         "category_diversity": cat_diversity,
-        "avg_order_value": round(avg_value, 2),
-        "total_purchases": float(n_purchases),
-        "total_returns": float(n_returns),
+        "avg_order_value": avg_value,
+        "total_purchases": n_purchases.astype(float),
+        "total_returns": n_returns.astype(float),
         "is_fraud": is_fraud,
-    })
+    }, index=users).reset_index()
+
+
+def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-user feature matrix (one row per user, in order of first appearance)
+    with the columns user_hash, FEATURE_COLS and is_fraud.
+    """
+    df = df.reset_index(drop=True)
+    return _finalize(*_partial_aggregates(df))
+
+
+def engineer_features_chunked(chunks: Iterable[pd.DataFrame], sorted_by_user: bool = False,
+                              merge_every: int = 8) -> pd.DataFrame:
+    """
+    Bounded-memory variant of engineer_features() over an iterator of
+    transaction chunks (e.g. pd.read_csv(..., chunksize=N)).
+
+    Each chunk is reduced to per-user partial aggregates, which are merged
+    every `merge_every` chunks and finalized at the end, so memory scales
+    with the number of users rather than the number of rows.
+
+    With sorted_by_user=True (input grouped by user_hash) a user's rows
+    never straddle two partials: the trailing user of each chunk is carried
+    into the next one. Output is then identical to engineer_features().
+    Unsorted input can differ only in the last rounded decimal of
+    avg_order_value, from summing a user's order values chunk by chunk.
+    """
+    merged, pending = None, []
+    carry = None
+    offset = 0
+
+    for chunk in chunks:
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        if sorted_by_user:
+            if carry is not None:
+                chunk = pd.concat([carry, chunk])
+            tail = (chunk["user_hash"] == chunk["user_hash"].iloc[-1]).to_numpy()
+            carry, chunk = chunk[tail], chunk[~tail]
+        if len(chunk):
+            pending.append(_partial_aggregates(chunk))
+        if len(pending) >= merge_every:
+            merged = _merge_partials(([merged] if merged is not None else []) + pending)
+            pending = []
+
+    if carry is not None and len(carry):
+        pending.append(_partial_aggregates(carry))
+    parts = ([merged] if merged is not None else []) + pending
+    if not parts:
+        raise ValueError("No transactions to engineer features from")
+    return _finalize(*(parts[0] if len(parts) == 1 else _merge_partials(parts)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Engineer per-user features from transactions")
+    parser.add_argument("--chunksize", type=int, default=0,
+                        help="Stream the transactions file in chunks of N rows (bounded memory)")
+    parser.add_argument("--sorted", action="store_true",
+                        help="Input is grouped by user_hash (exact results in chunked mode)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv",
+                        help="Format of data/synthetic_transactions.* and data/features.*")
+    args = parser.parse_args()
+    tx_path = data_path("synthetic_transactions", args.format)
+
+    print("Loading synthetic transactions...")
+    if args.chunksize:
+        features_df = engineer_features_chunked(iter_table(tx_path, args.chunksize), sorted_by_user=args.sorted)
+        print(f"Streamed {tx_path} in chunks of {args.chunksize} rows")
+    else:
+        df = read_table(tx_path)
+        print(f"Loaded {len(df)} rows, {df['user_hash'].nunique()} unique users")
+        features_df = engineer_features(df)
 
-features_df = pd.DataFrame(feature_rows)
-features_df.to_csv("data/features.csv", index=False)
+    write_table(features_df, data_path("features", args.format))
 
-print(f"\n✅ Feature matrix saved: {features_df.shape[0]} users × {features_df.shape[1]-2} features")
-print(f"   Fraud users: {features_df['is_fraud'].sum()} | Legit users: {(features_df['is_fraud']==0).sum()}")
-print(f"   Class imbalance ratio: {(features_df['is_fraud']==0).sum()}/{features_df['is_fraud'].sum()}")
-print("\nFeature statistics:")
-print(features_df.drop(columns=["user_hash", "is_fraud"]).describe().round(3))
+    print(f"\n✅ Feature matrix saved: {features_df.shape[0]} users × {features_df.shape[1]-2} features")
+    print(f"   Fraud users: {features_df['is_fraud'].sum()} | Legit users: {(features_df['is_fraud']==0).sum()}")
+    print(f"   Class imbalance ratio: {(features_df['is_fraud']==0).sum()}/{features_df['is_fraud'].sum()}")
+    print("\nFeature statistics:")
+    print(features_df.drop(columns=["user_hash", "is_fraud"]).describe().round(3))
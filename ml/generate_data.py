@@ -1,125 +1,208 @@
 """
 Synthetic Transaction Data Generator
 =====================================
-Generates 10,000 realistic e-commerce transaction records.
-Distribution: ~98% legitimate users, ~2% fraud seeds.
-Output: data/synthetic_transactions.csv
+Generates realistic e-commerce transaction records for N users.
+Distribution: ~98% legitimate users, ~2% fraud seeds (--fraud-rate).
+Output: data/synthetic_transactions.csv (or .parquet / .arrow via --format)
+
+Rows are generated with NumPy a block of users at a time and written to
+the output file block by block, so 10M+ rows take seconds and memory is
+bounded by the block size. Every block draws from its own generator
+seeded with (seed, block), so output is identical for a given seed,
+parameters and --as-of date (default: today).
+
+Per-user history length follows --history:
+  uniform    — 2–20 purchases (legit) / 5–30 (fraud), as in the demo data
+  lognormal  — same means, heavy right tail (a few very active users)
+  geometric  — same means, many one-off buyers
+scaled by --depth.
+
+Usage:
+    python generate_data.py
+    python generate_data.py --users 700000 --history lognormal --format parquet
 """
+import argparse
+import hashlib
+import time
+from datetime import date
+from typing import Iterator, Optional, Tuple
+
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-import random
-import hashlib
-import os
+import pyarrow as pa
 
-np.random.seed(42)
-random.seed(42)
+from pipeline_io import FORMATS, TableWriter, data_path
 
 N_USERS = 500
-N_LEGITIMATE = 490
+FRAUD_RATE = 0.02
 CATEGORIES = ["Clothing", "Electronics", "Footwear", "Accessories", "Books", "Sports"]
 SIZES = ["XS", "S", "M", "L", "XL", "XXL"]
-records = []
+ACTION_TYPES = ["Purchase", "ReturnRequest"]
+PRODUCTS = [f"PROD_{i}" for i in range(100, 1000)]
+HISTORY_DISTRIBUTIONS = ("uniform", "lognormal", "geometric")
+FRAUD_TYPES = ("wardrober", "rapid_returner", "serial_fraud")
+
+BLOCK_USERS = 100_000       # users generated (and written) per block
+DAY = np.timedelta64(1, "D")
+
+_ACTION_DICT = pa.array(ACTION_TYPES)
+_CATEGORY_DICT = pa.array(CATEGORIES)
+_SIZE_DICT = pa.array(SIZES)
+_PRODUCT_DICT = pa.array(PRODUCTS)
+
 
 def fake_user_hash(idx: int) -> str:
     return hashlib.sha256(f"user_{idx}@example.com:hackathon-salt".encode()).hexdigest()
 
-def random_date(start_days_ago: int, end_days_ago: int) -> datetime:
-    delta = random.randint(end_days_ago, start_days_ago)
-    return datetime.now() - timedelta(days=delta)
-
-
-# ── LEGITIMATE USERS (low return ratio, slow returns, no wardrobing)
-print("Generating legitimate user transactions...")
-for i in range(N_LEGITIMATE):
-    user_hash = fake_user_hash(i)
-    n_purchases = random.randint(2, 20)
-    n_returns = random.randint(0, max(1, int(n_purchases * 0.15)))  # ≤15% return rate
-
-    cat = random.choice(CATEGORIES)
-    for j in range(n_purchases):
-        purchase_date = random_date(365, 7)
-        delivery_date = purchase_date + timedelta(days=random.randint(2, 5))
-        order_id = f"ORD_L{i}_{j}"
-        records.append({
-            "user_hash": user_hash,
-            "action_type": "Purchase",
-            "timestamp": purchase_date,
-            "order_value": round(random.uniform(199, 8000), 2),
-            "product_category": random.choice(CATEGORIES),
-            "product_id": f"PROD_{random.randint(100, 999)}",
-            "size_variant": random.choice(SIZES) if cat == "Clothing" else None,
-            "delivery_date": delivery_date,
-            "return_date": None,
-            "order_id": order_id,
-            "is_fraud": 0,
-        })
-
-    # Some returns — with a realistic gap (7–21 days)
-    chosen_orders = random.sample(range(n_purchases), min(n_returns, n_purchases))
-    for j in chosen_orders:
-        base = records[-(n_purchases - j)]
-        return_date = base["delivery_date"] + timedelta(days=random.randint(7, 21))
-        records.append({
-            **base,
-            "action_type": "ReturnRequest",
-            "return_date": return_date,
-            "timestamp": return_date,
-        })
-
-
-# ── FRAUD USERS (high return ratio, rapid returns, wardrobing)
-print("Generating fraud user transactions...")
-for i in range(N_LEGITIMATE, N_USERS):
-    user_hash = fake_user_hash(i)
-    fraud_type = random.choice(["wardrober", "rapid_returner", "serial_fraud"])
-    n_purchases = random.randint(5, 30)
-    cat = "Clothing" if fraud_type == "wardrober" else random.choice(CATEGORIES)
-
-    product_id = f"PROD_FRAUD_{i}"
-    sizes_used = random.sample(SIZES, min(random.randint(3, 5), len(SIZES)))
-
-    for j in range(n_purchases):
-        purchase_date = random_date(365, 7)
-        delivery_date = purchase_date + timedelta(days=random.randint(2, 4))
-        order_id = f"ORD_F{i}_{j}"
-        size = sizes_used[j % len(sizes_used)] if fraud_type == "wardrober" else random.choice(SIZES)
-        records.append({
-            "user_hash": user_hash,
-            "action_type": "Purchase",
-            "timestamp": purchase_date,
-            "order_value": round(random.uniform(1500, 12000), 2),
-            "product_category": cat,
-            "product_id": product_id if fraud_type == "wardrober" else f"PROD_{random.randint(100,999)}",
-            "size_variant": size,
-            "delivery_date": delivery_date,
-            "return_date": None,
-            "order_id": order_id,
-            "is_fraud": 1,
-        })
-
-        # High return rate for fraud users (60–95%)
-        if random.random() < 0.80:
-            gap = random.randint(1, 3) if fraud_type in ("rapid_returner", "wardrober") else random.randint(1, 7)
-            return_date = delivery_date + timedelta(days=gap)
-            records.append({
-                "user_hash": user_hash,
-                "action_type": "ReturnRequest",
-                "timestamp": return_date,
-                "order_value": records[-1]["order_value"],
-                "product_category": cat,
-                "product_id": records[-1]["product_id"],
-                "size_variant": size,
-                "delivery_date": delivery_date,
-                "return_date": return_date,
-                "order_id": order_id,
-                "is_fraud": 1,
-            })
-
-
-df = pd.DataFrame(records)
-os.makedirs("data", exist_ok=True)
-df.to_csv("data/synthetic_transactions.csv", index=False)
-print(f"✅ Generated {len(df)} transaction records for {N_USERS} users")
-print(f"   Legitimate users: {N_LEGITIMATE} | Fraud users: {N_USERS - N_LEGITIMATE}")
-print(f"   Saved to data/synthetic_transactions.csv")
+
+def _user_hashes(users: np.ndarray) -> list:
+    """fake_user_hash() for many users, without the per-call overhead."""
+    sha256 = hashlib.sha256
+    return [sha256(b"user_%d@example.com:hackathon-salt" % i).hexdigest() for i in users.tolist()]
+
+
+def _is_fraud(users: np.ndarray, fraud_rate: float) -> np.ndarray:
+    """Fraud users spread evenly over the id space: exact count, independent of blocks."""
+    return np.floor((users + 1) * fraud_rate) > np.floor(users * fraud_rate)
+
+
+def _purchase_counts(rng: np.random.Generator, fraud: np.ndarray, history: str, depth: float) -> np.ndarray:
+    if history == "uniform":
+        counts = np.where(fraud, rng.integers(5, 31, fraud.size), rng.integers(2, 21, fraud.size))
+    else:
+        mean = np.where(fraud, 17.5, 11.0)
+        if history == "lognormal":
+            sigma = 1.0
+            counts = np.ceil(rng.lognormal(np.log(mean) - sigma ** 2 / 2, sigma))
+        elif history == "geometric":
+            counts = rng.geometric(1.0 / mean)
+        else:
+            raise ValueError(f"history must be one of {HISTORY_DISTRIBUTIONS}")
+    return np.maximum(1, (counts * depth).astype(np.int64))
+
+
+def _dictionary(codes: np.ndarray, dictionary: pa.Array, mask: Optional[np.ndarray] = None) -> pa.DictionaryArray:
+    return pa.DictionaryArray.from_arrays(pa.array(codes.astype(np.int16), mask=mask), dictionary)
+
+
+def _block(first_user: int, n_users: int, fraud_rate: float, history: str, depth: float,
+           seed: int, block: int, as_of: np.datetime64, first_order: int) -> Tuple[pa.Table, int]:
+    """One block of users' transactions, plus the number of orders (purchases) in it."""
+    rng = np.random.default_rng([seed, block])
+    users = np.arange(first_user, first_user + n_users)
+    fraud = _is_fraud(users, fraud_rate)
+
+    # ── Per-user traits
+    n_purchases = _purchase_counts(rng, fraud, history, depth)
+    fraud_type = np.where(fraud, rng.integers(0, len(FRAUD_TYPES), n_users), -1)
+    wardrober = fraud_type == 0
+    user_category = np.where(wardrober, 0, rng.integers(0, len(CATEGORIES), n_users))
+    # Legit users: share of purchases later returned (≤15%)
+    n_returns = rng.integers(0, np.maximum(1, (n_purchases * 0.15).astype(np.int64)) + 1)
+    # Wardrobers cycle one product through 3–5 sizes
+    user_product = rng.integers(0, len(PRODUCTS), n_users)
+    size_cycle = np.argsort(rng.random((n_users, len(SIZES))), axis=1)
+    cycle_len = rng.integers(3, 6, n_users)
+
+    # ── One row per purchase
+    u = np.repeat(np.arange(n_users), n_purchases)             # block-local user of each purchase
+    n = u.size
+    starts = np.cumsum(n_purchases) - n_purchases
+    j = np.arange(n) - np.repeat(starts, n_purchases)          # purchase number within the user
+    f = fraud[u]
+    ft = fraud_type[u]
+
+    purchased = (as_of - rng.integers(7, 366, n) * DAY
+                 + rng.integers(0, 86_400, n) * np.timedelta64(1, "s"))
+    delivered = purchased + np.where(f, rng.integers(2, 5, n), rng.integers(2, 6, n)) * DAY
+    value = np.round(np.where(f, rng.uniform(1500, 12000, n), rng.uniform(199, 8000, n)), 2)
+    category = np.where(f, user_category[u], rng.integers(0, len(CATEGORIES), n))
+    product = np.where(ft == 0, user_product[u], rng.integers(0, len(PRODUCTS), n))
+    size = np.where(ft == 0, size_cycle[u, j % cycle_len[u]], rng.integers(0, len(SIZES), n))
+    no_size = ~f & (user_category[u] != 0)                     # legit sizes only for clothing shoppers
+
+    # Legit: the first n_returns purchases (dates are i.i.d.); fraud: 80% of purchases
+    returned = np.where(f, rng.random(n) < 0.80, j < n_returns[u])
+    gap = np.where(ft == 2, rng.integers(1, 8, n), np.where(f, rng.integers(1, 4, n), rng.integers(7, 22, n)))
+    return_date = delivered + gap * DAY
+
+    # ── Returns copy their purchase; order each user's rows by time
+    source = np.concatenate([np.arange(n), np.flatnonzero(returned)])
+    is_return = np.arange(source.size) >= n
+    timestamp = np.where(is_return, return_date[source], purchased[source])
+    # One int64 key (user, seconds since as_of - 400 days): far cheaper than lexsort
+    seconds = (timestamp - (as_of - 400 * DAY)).astype(np.int64)
+    order = np.argsort((u[source].astype(np.int64) << 32) | seconds, kind="stable")
+    source, is_return, timestamp = source[order], is_return[order], timestamp[order]
+
+    hashes = pa.array(_user_hashes(users))
+    table = pa.table({
+        "user_hash": hashes.take(pa.array(u[source])),
+        "action_type": _dictionary(is_return.astype(np.int16), _ACTION_DICT),
+        "timestamp": pa.array(timestamp),
+        "order_value": pa.array(value[source]),
+        "product_category": _dictionary(category[source], _CATEGORY_DICT),
+        "product_id": _dictionary(product[source], _PRODUCT_DICT),
+        "size_variant": _dictionary(size[source], _SIZE_DICT, mask=no_size[source]),
+        "delivery_date": pa.array(delivered[source]),
+        "return_date": pa.array(return_date[source], mask=~is_return),
+        "order_id": pa.array(first_order + source),
+        "is_fraud": pa.array(f[source].astype(np.int8)),
+    })
+    return table, n
+
+
+def iter_transactions(n_users: int = N_USERS, fraud_rate: float = FRAUD_RATE, history: str = "uniform",
+                      depth: float = 1.0, seed: int = 42, as_of: Optional[date] = None) -> Iterator[pa.Table]:
+    """Transactions as Arrow tables of up to BLOCK_USERS users, grouped by user."""
+    as_of = np.datetime64(as_of or date.today(), "s")
+    first_order = 1
+    for block, first_user in enumerate(range(0, n_users, BLOCK_USERS)):
+        table, orders = _block(first_user, min(BLOCK_USERS, n_users - first_user), fraud_rate, history,
+                               depth, seed, block, as_of, first_order)
+        first_order += orders
+        yield table
+
+
+def generate_transactions(n_users: int = N_USERS, fraud_rate: float = FRAUD_RATE, history: str = "uniform",
+                          depth: float = 1.0, seed: int = 42, as_of: Optional[date] = None) -> pd.DataFrame:
+    """In-memory DataFrame of iter_transactions() (typed datetime and categorical columns)."""
+    tables = list(iter_transactions(n_users, fraud_rate, history, depth, seed, as_of))
+    return pa.concat_tables(tables).to_pandas()
+
+
+def write_transactions(path: str, n_users: int = N_USERS, fraud_rate: float = FRAUD_RATE,
+                       history: str = "uniform", depth: float = 1.0, seed: int = 42,
+                       as_of: Optional[date] = None) -> Tuple[int, int]:
+    """Stream generated transactions to `path` block by block; returns (rows, fraud users)."""
+    rows = 0
+    with TableWriter(path) as writer:
+        for table in iter_transactions(n_users, fraud_rate, history, depth, seed, as_of):
+            writer.write(table)
+            rows += table.num_rows
+    fraud_users = int(_is_fraud(np.arange(n_users), fraud_rate).sum())
+    return rows, fraud_users
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic transactions")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv",
+                        help="Output format (parquet/arrow keep typed datetime and categorical columns)")
+    parser.add_argument("--users", type=int, default=N_USERS)
+    parser.add_argument("--fraud-rate", type=float, default=FRAUD_RATE)
+    parser.add_argument("--history", choices=HISTORY_DISTRIBUTIONS, default="uniform",
+                        help="Distribution of purchases per user")
+    parser.add_argument("--depth", type=float, default=1.0, help="Scale every user's history length")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None,
+                        help="Latest transaction date (YYYY-MM-DD); pin it for byte-identical reruns")
+    args = parser.parse_args()
+
+    out_path = data_path("synthetic_transactions", args.format)
+    started = time.perf_counter()
+    rows, fraud_users = write_transactions(out_path, args.users, args.fraud_rate, args.history,
+                                           args.depth, args.seed, args.as_of)
+    print(f"✅ Generated {rows} transaction records for {args.users} users "
+          f"in {time.perf_counter() - started:.1f}s")
+    print(f"   Legitimate users: {args.users - fraud_users} | Fraud users: {fraud_users}")
+    print(f"   Saved to {out_path}")
@@ -0,0 +1,235 @@
+"""
+Hyperparameter Search
+======================
+Stratified k-fold cross-validated search over RandomForest (and, if
+installed, XGBoost) hyperparameters, run in parallel across cores.
+
+  - Each fold's training split is class-balanced once (SMOTE when
+    imbalanced-learn is installed, else random oversampling of the fraud
+    class, as in run_all.py) and cached in data/cv_cache/ keyed by a hash
+    of the data, so every candidate reuses it — across runs too.
+  - Every (candidate, fold) pair is one task on a process pool; models
+    inside a task are single-threaded so tasks don't oversubscribe cores.
+  - Inference cost is the number of tree nodes visited per scored row,
+    n_trees × depth: exactly the work the backend's flat forest evaluator
+    does, and proportional to XGBoost's.
+
+select() then picks the cheapest candidate whose mean ROC-AUC is within
+`tolerance` of the best one, so a 40-tree forest wins over a 200-tree one
+when they score the same.
+
+Usage (also available as `train_model.py --search` / `run_all.py --search`):
+    python model_search.py --format parquet --folds 5 --workers 8
+"""
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+CACHE_DIR = os.path.join("data", "cv_cache")
+# Part of the fold cache key: bump whenever balance() changes its output
+BALANCE_VERSION = 1
+
+RF_GRID = {"n_estimators": [25, 50, 100, 200], "max_depth": [4, 6, 10], "min_samples_leaf": [2]}
+XGB_GRID = {"n_estimators": [50, 100, 200], "max_depth": [3, 6], "learning_rate": [0.05, 0.1]}
+
+
+def default_candidates(include_xgboost: bool = True) -> List[Dict[str, Any]]:
+    """The search space: every grid point as {"model": ..., "params": {...}}."""
+    grids = [("random_forest", RF_GRID)]
+    if include_xgboost:
+        try:
+            import xgboost  # noqa: F401
+            grids.append(("xgboost", XGB_GRID))
+        except ImportError:
+            pass
+    return [
+        {"model": model, "params": dict(zip(grid, values))}
+        for model, grid in grids
+        for values in itertools.product(*grid.values())
+    ]
+
+
+def build_model(candidate: Dict[str, Any], n_jobs: int = 1, seed: int = 42):
+    """Unfitted estimator for a candidate (same fixed settings as the pipeline scripts)."""
+    if candidate["model"] == "random_forest":
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(class_weight="balanced", random_state=seed, n_jobs=n_jobs,
+                                      **candidate["params"])
+    if candidate["model"] == "xgboost":
+        import xgboost as xgb
+        return xgb.XGBClassifier(subsample=0.8, colsample_bytree=0.8, eval_metric="logloss",
+                                 random_state=seed, verbosity=0, n_jobs=n_jobs, **candidate["params"])
+    raise ValueError(f"Unknown model {candidate['model']!r}")
+
+
+def inference_cost(model) -> int:
+    """Tree nodes visited per scored row: n_trees × depth."""
+    if hasattr(model, "estimators_"):
+        return len(model.estimators_) * max(tree.get_depth() for tree in model.estimators_)
+    return int(model.n_estimators) * int(model.max_depth)
+
+
+# ── Per-fold balanced training data ───────────────────────────────────────────
+def _has_smote() -> bool:
+    try:
+        from imblearn.over_sampling import SMOTE  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def balance(X: np.ndarray, y: np.ndarray, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """Oversample the fraud class to parity: SMOTE if available, else resampling."""
+    n_fraud = int(y.sum())
+    if _has_smote() and n_fraud > 1:
+        from imblearn.over_sampling import SMOTE
+        return SMOTE(random_state=seed, k_neighbors=min(5, n_fraud - 1)).fit_resample(X, y)
+    from sklearn.utils import resample
+    fraud, legit = np.flatnonzero(y == 1), np.flatnonzero(y == 0)
+    upsampled = resample(X[fraud], n_samples=len(legit), random_state=seed)
+    return np.vstack([X[legit], upsampled]), np.concatenate([y[legit], np.ones(len(legit), dtype=y.dtype)])
+
+
+def prepare_folds(X: np.ndarray, y: np.ndarray, n_splits: int = 5, seed: int = 42,
+                  cache_dir: str = CACHE_DIR) -> List[str]:
+    """Split, balance and cache every fold; returns one .npz path per fold."""
+    from sklearn.model_selection import StratifiedKFold
+
+    key = hashlib.sha256()
+    for part in (np.ascontiguousarray(X), np.ascontiguousarray(y)):
+        key.update(part.tobytes())
+    # Balancing settings too, so a changed balance() never reuses stale folds
+    method = "smote" if _has_smote() else "resample"
+    key.update(f"{n_splits}:{seed}:balance-v{BALANCE_VERSION}:{method}".encode())
+    fold_dir = os.path.join(cache_dir, key.hexdigest()[:16])
+    os.makedirs(fold_dir, exist_ok=True)
+
+    paths = []
+    splits = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed).split(X, y)
+    for k, (train, valid) in enumerate(splits):
+        path = os.path.join(fold_dir, f"fold_{k}.npz")
+        if not os.path.exists(path):
+            X_bal, y_bal = balance(X[train], y[train], seed)
+            tmp = path + ".tmp.npz"
+            np.savez(tmp, X_train=X_bal, y_train=y_bal, X_valid=X[valid], y_valid=y[valid])
+            os.replace(tmp, path)
+        paths.append(path)
+    return paths
+
+
+# ── Search ────────────────────────────────────────────────────────────────────
+def _evaluate(task: Tuple[int, Dict[str, Any], str, int]) -> Dict[str, Any]:
+    """Fit one candidate on one cached fold (runs in a worker process)."""
+    from sklearn.metrics import roc_auc_score
+
+    index, candidate, fold_path, seed = task
+    model = build_model(candidate, n_jobs=1, seed=seed)
+    with np.load(fold_path) as fold:
+        started = time.perf_counter()
+        model.fit(fold["X_train"], fold["y_train"])
+        fit_s = time.perf_counter() - started
+        proba = model.predict_proba(fold["X_valid"])[:, 1]
+        auc = float(roc_auc_score(fold["y_valid"], proba))
+    return {"index": index, "auc": auc, "cost": inference_cost(model), "fit_s": fit_s}
+
+
+def _pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    # fork only: the pipeline scripts run at import time and must not be
+    # re-executed by spawned workers
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+
+
+def search(X: np.ndarray, y: np.ndarray, candidates: Optional[List[Dict[str, Any]]] = None,
+           n_splits: int = 5, workers: Optional[int] = None, seed: int = 42,
+           cache_dir: str = CACHE_DIR, log=print) -> List[Dict[str, Any]]:
+    """
+    Cross-validate every candidate; returns one result per candidate with
+    mean/std ROC-AUC across folds and its inference cost, best AUC first.
+    """
+    candidates = candidates if candidates is not None else default_candidates()
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    folds = prepare_folds(X, y, n_splits, seed, cache_dir)
+    log(f"   {len(folds)} balanced folds ready ({time.perf_counter() - started:.1f}s, cache {os.path.dirname(folds[0])})")
+
+    tasks = [(i, c, path, seed) for i, c in enumerate(candidates) for path in folds]
+    pool = _pool(workers)
+    log(f"   {len(candidates)} candidates × {len(folds)} folds = {len(tasks)} fits "
+        f"on {workers if pool else 1} process(es)")
+    if pool is None:
+        scores = [_evaluate(t) for t in tasks]
+    else:
+        with pool:
+            scores = list(pool.map(_evaluate, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+    results = []
+    for i, candidate in enumerate(candidates):
+        mine = [s for s in scores if s["index"] == i]
+        aucs = np.array([s["auc"] for s in mine])
+        results.append({
+            **candidate,
+            "auc_mean": round(float(aucs.mean()), 5),
+            "auc_std": round(float(aucs.std()), 5),
+            "cost": max(s["cost"] for s in mine),
+            "fit_s": round(float(np.mean([s["fit_s"] for s in mine])), 3),
+        })
+    results.sort(key=lambda r: (-r["auc_mean"], r["cost"]))
+    log(f"   Search finished in {time.perf_counter() - started:.1f}s")
+    return results
+
+
+def select(results: List[Dict[str, Any]], tolerance: float = 0.002) -> Dict[str, Any]:
+    """Cheapest candidate whose mean ROC-AUC is within `tolerance` of the best."""
+    best_auc = max(r["auc_mean"] for r in results)
+    eligible = [r for r in results if r["auc_mean"] >= best_auc - tolerance]
+    return min(eligible, key=lambda r: (r["cost"], -r["auc_mean"]))
+
+
+def report(results: List[Dict[str, Any]], chosen: Dict[str, Any], top: int = 10, log=print) -> None:
+    log(f"   {'model':<14} {'params':<52} {'AUC':>14} {'cost':>7}")
+    for r in results[:top]:
+        mark = "  ◀ selected" if r is chosen else ""
+        params = ", ".join(f"{k}={v}" for k, v in r["params"].items())
+        log(f"   {r['model']:<14} {params:<52} {r['auc_mean']:.4f}±{r['auc_std']:.4f} {r['cost']:>7}{mark}")
+    if chosen not in results[:top]:
+        params = ", ".join(f"{k}={v}" for k, v in chosen["params"].items())
+        log(f"   {chosen['model']:<14} {params:<52} {chosen['auc_mean']:.4f}±{chosen['auc_std']:.4f} "
+            f"{chosen['cost']:>7}  ◀ selected")
+
+
+def save_results(results: List[Dict[str, Any]], chosen: Dict[str, Any], path: str, **extra) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({**extra, "selected": chosen, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    import argparse
+    from feature_engineering import FEATURE_COLS
+    from pipeline_io import FORMATS, data_path, read_table
+
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv", help="Format of data/features.*")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=0, help="Processes (default: CPU count)")
+    parser.add_argument("--tolerance", type=float, default=0.002, help="AUC allowed below the best")
+    parser.add_argument("--no-xgboost", action="store_true", help="Search RandomForest only")
+    args = parser.parse_args()
+
+    df = read_table(data_path("features", args.format), columns=FEATURE_COLS + ["is_fraud"])
+    X, y = df[FEATURE_COLS].values, df["is_fraud"].values
+    results = search(X, y, default_candidates(not args.no_xgboost), n_splits=args.folds,
+                     workers=args.workers or None)
+    chosen = select(results, args.tolerance)
+    report(results, chosen)
+    save_results(results, chosen, "models/search_results.json", folds=args.folds, tolerance=args.tolerance)
+    print("✅ Results saved to models/search_results.json")
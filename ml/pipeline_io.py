@@ -0,0 +1,146 @@
+"""
+Pipeline I/O
+=============
+Shared readers/writers for the pipeline's intermediate tables
+(data/synthetic_transactions.* and data/features.*).
+
+The file extension picks the format:
+  .csv      — plain text, dates re-parsed on every read (default)
+  .parquet  — columnar, typed datetime + categorical columns
+  .arrow    — Arrow IPC (uncompressed), memory-mapped zero-copy reads
+
+Columnar formats skip CSV parsing and date parsing entirely, which is
+what dominates load time on large retraining runs.
+"""
+import os
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+FORMATS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+
+DATE_COLUMNS = ["timestamp", "delivery_date", "return_date"]
+# Low-cardinality string columns stored dictionary-encoded
+CATEGORICAL_COLUMNS = ["action_type", "product_category", "size_variant"]
+
+
+def data_path(stem: str, fmt: str = "csv", data_dir: str = "data") -> str:
+    """e.g. data_path("features", "parquet") -> data/features.parquet"""
+    return os.path.join(data_dir, stem + FORMATS[fmt])
+
+
+def _format_of(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    for fmt, suffix in FORMATS.items():
+        if ext == suffix:
+            return fmt
+    if ext == ".feather":
+        return "arrow"
+    raise ValueError(f"Unsupported table format: {path}")
+
+
+def prepare_transactions(df: pd.DataFrame) -> pd.DataFrame:
+    """Give transaction columns their typed dtypes (datetime64 / category)."""
+    df = df.copy()
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def write_table(df: pd.DataFrame, path: str) -> None:
+    fmt = _format_of(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        import pyarrow.feather as feather
+        # Uncompressed so readers can map the buffers instead of decoding them
+        feather.write_feather(df.reset_index(drop=True), path, compression="uncompressed")
+
+
+class TableWriter:
+    """
+    Append Arrow tables (or DataFrames) with the same schema to one
+    pipeline table file, chunk by chunk, without holding it in memory:
+
+        with TableWriter("data/synthetic_transactions.parquet") as w:
+            for chunk in chunks:
+                w.write(chunk)
+
+    Arrow IPC files allow one dictionary per column, so categorical columns
+    must use the same categories in every chunk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fmt = _format_of(path)
+        self._writer = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def write(self, table) -> None:
+        import pyarrow as pa
+        if isinstance(table, pd.DataFrame):
+            table = pa.Table.from_pandas(table, preserve_index=False)
+        if self._writer is None:
+            if self.fmt == "csv":
+                import pyarrow.csv as pcsv
+                self._writer = pcsv.CSVWriter(self.path, table.schema)
+            elif self.fmt == "parquet":
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                self._writer = pa.ipc.new_file(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self) -> "TableWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _csv_date_columns(path: str) -> List[str]:
+    header = pd.read_csv(path, nrows=0).columns
+    return [c for c in DATE_COLUMNS if c in header]
+
+
+def read_table(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read a pipeline table; columnar formats are memory-mapped."""
+    fmt = _format_of(path)
+    if fmt == "csv":
+        dates = [c for c in _csv_date_columns(path) if columns is None or c in columns]
+        return pd.read_csv(path, usecols=columns, parse_dates=dates)
+    if fmt == "parquet":
+        return pd.read_parquet(path, columns=columns, memory_map=True)
+    import pyarrow.feather as feather
+    return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+
+def iter_table(path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Yield a table in chunks of about `chunksize` rows (bounded memory)."""
+    fmt = _format_of(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, chunksize=chunksize, parse_dates=_csv_date_columns(path))
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        import pyarrow as pa
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                for start in range(0, batch.num_rows, chunksize):
+                    yield batch.slice(start, chunksize).to_pandas()
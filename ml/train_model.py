@@ -1,33 +1,45 @@
 """
 Model Training Pipeline
 ========================
-1. Loads engineered features from data/features.csv
+1. Loads engineered features from data/features.csv (or .parquet / .arrow via --format)
 2. Applies SMOTE to balance the fraud/legit class imbalance
-3. Trains XGBoost classifier
+3. Trains XGBoost classifier — or, with --search, the cheapest forest/XGBoost
+   configuration that matches the best cross-validated ROC-AUC (model_search.py)
 4. Evaluates and prints metrics
 5. Saves models/fraud_model.pkl + models/feature_names.json
+   (plus the flat export models/fraud_model.flat when the model is a forest)
 """
 import os
 import json
+import argparse
 import joblib
-import numpy as np
-import pandas as pd
-from sklearn.model_selection import train_test_split, StratifiedKFold, cross_val_score
+from sklearn.model_selection import train_test_split
 from sklearn.metrics import (
     classification_report, confusion_matrix, roc_auc_score, f1_score
 )
-from sklearn.preprocessing import StandardScaler
 from imblearn.over_sampling import SMOTE
-from imblearn.pipeline import Pipeline as ImbPipeline
 import xgboost as xgb
 
+from pipeline_io import FORMATS, data_path, read_table
+import model_search
+
+parser = argparse.ArgumentParser(description="Train the fraud model")
+parser.add_argument("--format", choices=sorted(FORMATS), default="csv", help="Format of data/features.*")
+parser.add_argument("--search", action="store_true",
+                    help="Pick the model by cross-validated hyperparameter search instead of the fixed XGBoost")
+parser.add_argument("--folds", type=int, default=5, help="CV folds for --search")
+parser.add_argument("--workers", type=int, default=0, help="Processes for --search (default: CPU count)")
+parser.add_argument("--tolerance", type=float, default=0.002,
+                    help="--search picks the cheapest model within this ROC-AUC of the best")
+args = parser.parse_args()
+
 print("=" * 60)
 print("  ReturnGuard AI — XGBoost + SMOTE Training Pipeline")
 print("=" * 60)
 
 # ── 1. Load Features
 print("\n[1/5] Loading feature matrix...")
-df = pd.read_csv("data/features.csv")
+df = read_table(data_path("features", args.format))
 print(f"    Shape: {df.shape}")
 print(f"    Class distribution → Legit: {(df['is_fraud']==0).sum()}, Fraud: {df['is_fraud'].sum()}")
 
@@ -58,20 +70,30 @@ X_res, y_res = smote.fit_resample(X_train, y_train)
 print(f"    Before SMOTE → Legit: {(y_train==0).sum()}, Fraud: {y_train.sum()}")
 print(f"    After  SMOTE → Legit: {(y_res==0).sum()}, Fraud: {y_res.sum()}")
 
-# ── 4. Train XGBoost
-print("\n[4/5] Training XGBoost classifier...")
-model = xgb.XGBClassifier(
-    n_estimators=200,
-    max_depth=6,
-    learning_rate=0.05,
-    subsample=0.8,
-    colsample_bytree=0.8,
-    scale_pos_weight=1,   # SMOTE already balanced classes
-    use_label_encoder=False,
-    eval_metric="logloss",
-    random_state=42,
-    verbosity=0,
-)
+# ── 4. Train XGBoost (or the search winner)
+if args.search:
+    print(f"\n[4/5] Searching hyperparameters ({args.folds}-fold stratified CV on the training split)...")
+    results = model_search.search(X_train, y_train, n_splits=args.folds, workers=args.workers or None)
+    chosen = model_search.select(results, args.tolerance)
+    model_search.report(results, chosen)
+    model_search.save_results(results, chosen, "models/search_results.json",
+                              folds=args.folds, tolerance=args.tolerance)
+    print(f"    Refitting {chosen['model']} {chosen['params']} on the SMOTE-balanced training split...")
+    model = model_search.build_model(chosen, n_jobs=-1)
+else:
+    print("\n[4/5] Training XGBoost classifier...")
+    model = xgb.XGBClassifier(
+        n_estimators=200,
+        max_depth=6,
+        learning_rate=0.05,
+        subsample=0.8,
+        colsample_bytree=0.8,
+        scale_pos_weight=1,   # SMOTE already balanced classes
+        use_label_encoder=False,
+        eval_metric="logloss",
+        random_state=42,
+        verbosity=0,
+    )
 model.fit(X_res, y_res)
 
 # ── 5. Evaluate
@@ -110,6 +132,12 @@ with open(feature_names_path, "w") as f:
 
 print(f"\n✅ Model saved to {model_path}")
 print(f"✅ Feature names saved to {feature_names_path}")
+
+# A searched RandomForest is served from the flat export; refresh it with the
+# pickle. (XGBoost has none: the backend ignores a flat export older than the pickle.)
+if hasattr(model, "estimators_"):
+    from export_forest import export_forest
+    export_forest(model, X, "models/fraud_model.flat")
 print(f"\n{'='*60}")
 print(f"  Training complete! ROC-AUC: {roc_auc:.4f}, F1: {f1:.4f}")
 print(f"{'='*60}")